@@ -185,6 +185,7 @@ import logging
 import traceback
 import os
 from paddleocr import PaddleOCR
+from util.models import ModelRegistry, warmup_yolo, warmup_paddleocr
 from util.sort import *
 import torch
 from torchvision.ops import nms
@@ -251,11 +252,14 @@ REGION_CODES = region('region.txt')
 
 print(REGION_CODES)
 
+MODELS = ModelRegistry()
+MODELS.register('vehicle', lambda: YOLO('model/yolo11n.pt'), warmup=warmup_yolo)
+MODELS.register('plate', lambda: YOLO('model/best.pt'), warmup=warmup_yolo)
+MODELS.register('ocr', lambda: PaddleOCR(use_angle_cls=True, lang='en'), warmup=warmup_paddleocr)
+MODELS.preload()
+
 def model():
-    model_vehicle = YOLO('model/yolo11n.pt')
-    model_plate = YOLO('model/best.pt')
-    reader = PaddleOCR(use_angle_cls=True, lang='en')
-    return model_vehicle, model_plate, reader
+    return MODELS.get('vehicle'), MODELS.get('plate'), MODELS.get('ocr')
 
 def format_plate_number(text):
     print(f"Formatting plate number: {text}")
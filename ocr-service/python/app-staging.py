@@ -1,27 +1,38 @@
-from flask import Flask, request, render_template, jsonify, send_file
-import cv2
-import random
-import numpy as np
-from pathlib import Path
-from ultralytics import YOLO
-import re
-from difflib import get_close_matches
-from matplotlib import pyplot as plt
 import time
-from flask_cors import CORS
+from util.startup import StartupProfile
+
+# Start-up is timed per import group and initialization phase (see /health).
+# torch, ultralytics, paddleocr and google.cloud are only imported on first use.
+STARTUP = StartupProfile()
+
+with STARTUP.phase('import flask'):
+    from flask import Flask, request, render_template, jsonify, send_file
+    from flask_cors import CORS
+with STARTUP.phase('import cv2/numpy'):
+    import cv2
+    import numpy as np
 import logging
-import traceback
 import os
-from paddleocr import PaddleOCR
-from util.sort import *
-import torch
-from torchvision.ops import nms
-import csv
-from scipy.interpolate import interp1d
-import ast
-import pandas as pd
-from google.cloud import storage
-from datetime import datetime
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+with STARTUP.phase('import util'):
+    from util.models import ModelRegistry, load_yolo, load_paddleocr, warmup_yolo, warmup_paddleocr
+    from util.archive import UploadArchiver, ImageEncoder, decode_image
+    from util.ocr import (plate_variants, iter_plate_texts, batch_plate_texts, recognize, plate_quality,
+                          PlateOCRScheduler)
+    from util.ocr_pool import OCRProcessPool
+    from util.batching import MicroBatcher
+    from util.annotations import DeferredRenders
+    from util.cache import ResultCache, SingleFlight, content_hash
+    from util.plates import PlateNormalizer, PLATE_FORMAT
+    from util.crop_ring import CropRing
+    from util.video import (DetectionLog, FrameBatcher, FrameSampler, StreamingRenderer, interpolate_detections,
+                            write_detections_csv)
+    from util.jobs import JobManager, JobQueueFull
+    from util.pipeline import Pipeline
+    from util.sort import Sort, VectorSort
+    from util.tracking import StreamTrackers
 
 
 app = Flask(__name__)
@@ -35,6 +46,105 @@ OUTPUT_FOLDER = Path('./output')
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 OUTPUT_FOLDER.mkdir(exist_ok=True)
 
+# Raw uploads are decoded in memory; writing them to UPLOAD_FOLDER is an
+# optional archival step that runs off the request thread.
+ARCHIVE_UPLOADS = os.environ.get('ARCHIVE_UPLOADS', 'true').lower() == 'true'
+ARCHIVER = UploadArchiver(enabled=ARCHIVE_UPLOADS)
+
+# Cold-start mode: skip the background model and cloud client warm-up and let
+# the first request that needs each of them pay for it
+LAZY_STARTUP = os.environ.get('LAZY_STARTUP', 'false').lower() == 'true'
+
+# Annotated images are encoded with OpenCV on a background thread, as
+# OUTPUT_IMAGE_FORMAT (jpg, png or webp); OUTPUT_MAX_SIDE > 0 downscales them
+# to previews whose longer side is at most that many pixels
+IMAGE_ENCODER = ImageEncoder(fmt=os.environ.get('OUTPUT_IMAGE_FORMAT', 'jpg'),
+                             quality=int(os.environ.get('OUTPUT_JPEG_QUALITY', '85')),
+                             max_side=int(os.environ.get('OUTPUT_MAX_SIDE', '0')) or None)
+
+# How read_plate runs OCR over its preprocessed variants: sequential,
+# early_exit (stop at the first valid plate) or batch (one recognizer batch)
+OCR_MODE = os.environ.get('OCR_MODE', 'early_exit')
+# Plate crops from best.pt are already tight, so PaddleOCR's own text detection
+# and angle classifier can be skipped and the crops fed to the recognizer
+OCR_RECOGNITION_ONLY = os.environ.get('OCR_RECOGNITION_ONLY', 'false').lower() == 'true'
+
+# With OCR_PROCESSES > 0, plate OCR runs in that many worker processes, each
+# with its own PaddleOCR, instead of on the request threads of this process
+OCR_PROCESSES = int(os.environ.get('OCR_PROCESSES', '0'))
+# Plate crops travel between stages and processes through a shared-memory ring
+# of CROP_RING_SLOTS slots of CROP_SLOT_KB each; larger crops are copied
+CROP_RING_SLOTS = int(os.environ.get('CROP_RING_SLOTS', '64'))
+CROP_SLOT_KB = int(os.environ.get('CROP_SLOT_KB', '256'))
+OCR_POOL = None  # started by start_services()
+CROP_RING = None
+
+# Annotated images are only needed by people looking at them: eager (default)
+# draws them for every request and uploads them to GCS, lazy draws them on the
+# first /output fetch from the stored detections of the last
+# ANNOTATE_PENDING_MAX requests, on this instance only, off never
+ANNOTATE_IMAGES = os.environ.get('ANNOTATE_IMAGES', 'eager')
+DEFERRED_RENDERS = DeferredRenders(capacity=int(os.environ.get('ANNOTATE_PENDING_MAX', '256')))
+
+# Concurrent /api/process-image requests are gathered for up to
+# IMAGE_BATCH_WAIT_MS and run through the detectors and OCR as one batch of at
+# most IMAGE_BATCH_SIZE images; 1 disables batching
+IMAGE_BATCH_SIZE = int(os.environ.get('IMAGE_BATCH_SIZE', '8'))
+IMAGE_BATCH_WAIT_MS = float(os.environ.get('IMAGE_BATCH_WAIT_MS', '5'))
+IMAGE_BATCHER = None  # started by start_services()
+PLATE_BATCHER = None
+
+# Results of recent uploads are reused for byte-identical images for
+# RESULT_CACHE_TTL seconds; RESULT_CACHE_SIZE=0 disables the cache. A
+# non-negative RESULT_CACHE_PHASH_DISTANCE also reuses them for images whose
+# perceptual hash is within that many bits. This is opt-in: at a fixed gate
+# camera a different car can hash close to the previous one
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '256'))
+RESULT_CACHE = ResultCache(max_entries=RESULT_CACHE_SIZE, ttl=float(os.environ.get('RESULT_CACHE_TTL', '30')),
+                           max_distance=int(os.environ.get('RESULT_CACHE_PHASH_DISTANCE', '-1'))
+                           ) if RESULT_CACHE_SIZE > 0 else None
+# Identical uploads being processed at the same time share one computation
+IN_FLIGHT = SingleFlight()
+
+# Video jobs decode each frame once; frames wait at most this many frames for
+# later detections before being annotated, and CSV output is opt-in
+VIDEO_LOOKAHEAD_FRAMES = int(os.environ.get('VIDEO_LOOKAHEAD_FRAMES', '30'))
+VIDEO_EXPORT_CSV = os.environ.get('VIDEO_EXPORT_CSV', 'false').lower() == 'true'
+# Detector sampling: every VIDEO_STRIDE-th frame, or with VIDEO_ADAPTIVE_STRIDE
+# every VIDEO_IDLE_STRIDE-th frame while idle and every frame while something
+# moves or is tracked. A stride given with the request overrides either
+VIDEO_STRIDE = int(os.environ.get('VIDEO_STRIDE', '1'))
+VIDEO_ADAPTIVE_STRIDE = os.environ.get('VIDEO_ADAPTIVE_STRIDE', 'false').lower() == 'true'
+VIDEO_IDLE_STRIDE = int(os.environ.get('VIDEO_IDLE_STRIDE', '5'))
+# Vehicle tracker for videos: 'vector' keeps all tracks in stacked arrays and
+# updates them in one batched step, 'sort' runs one filterpy filter per track
+VIDEO_TRACKER = os.environ.get('VIDEO_TRACKER', 'vector')
+# Per-track OCR budget in videos: at most this many reads per vehicle, and none
+# after a reading that is format-valid with at least OCR_ACCEPT_SCORE
+OCR_MAX_READS_PER_TRACK = int(os.environ.get('OCR_MAX_READS_PER_TRACK', '3'))
+OCR_ACCEPT_SCORE = float(os.environ.get('OCR_ACCEPT_SCORE', '0.9'))
+# Sampled frames are run through the detectors in batches of VIDEO_BATCH_SIZE,
+# or fewer once the oldest frame has waited VIDEO_BATCH_LATENCY_MS
+VIDEO_BATCH_SIZE = int(os.environ.get('VIDEO_BATCH_SIZE', '8'))
+VIDEO_BATCH_LATENCY_MS = float(os.environ.get('VIDEO_BATCH_LATENCY_MS', '200'))
+# Bounded queues between the decode, inference and encode stages, and the
+# number of threads reading plate crops in parallel
+VIDEO_QUEUE_FRAMES = int(os.environ.get('VIDEO_QUEUE_FRAMES', '8'))
+VIDEO_OCR_WORKERS = int(os.environ.get('VIDEO_OCR_WORKERS', '2'))
+
+# /api/track-frame keeps one tracker per camera; frames arriving together from
+# different cameras share a batched Kalman step, and a camera that sends no
+# frame for STREAM_IDLE_TIMEOUT seconds loses its tracks
+STREAM_IDLE_TIMEOUT = float(os.environ.get('STREAM_IDLE_TIMEOUT', '300'))
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', '32'))
+STREAM_BATCH_WAIT_MS = float(os.environ.get('STREAM_BATCH_WAIT_MS', '5'))
+STREAM_TRACKERS = None  # started by start_services()
+
+# /api/process-video hands videos to this pool and returns a job id at once,
+# so a long clip no longer holds a gunicorn thread for minutes
+VIDEO_JOBS = JobManager(max_workers=int(os.environ.get('VIDEO_JOB_WORKERS', '1')),
+                        max_pending=int(os.environ.get('VIDEO_JOB_QUEUE', '8')))
+
 def region(file_path):
     region_codes = {}
     with open(file_path, 'r') as file:
@@ -45,105 +155,43 @@ def region(file_path):
     return region_codes
 
 REGION_CODES = region('region.txt')
+# Nearest region code of every 1-2 letter prefix, worked out once
+with STARTUP.phase('plate normalizer'):
+    PLATE_NORMALIZER = PlateNormalizer(REGION_CODES)
 
 print(REGION_CODES)
 
+MODELS = ModelRegistry(profile=STARTUP)
+MODELS.register('vehicle', lambda: load_yolo('model/yolo11n.pt'), warmup=warmup_yolo)
+MODELS.register('plate', lambda: load_yolo('model/best.pt'), warmup=warmup_yolo)
+MODELS.register('ocr', lambda: load_paddleocr(use_angle_cls=True, lang='en'), warmup=warmup_paddleocr)
+
 def model():
-    model_vehicle = YOLO('model/yolo11n.pt')
-    model_plate = YOLO('model/best.pt')
-    reader = PaddleOCR(use_angle_cls=True, lang='en')
-    return model_vehicle, model_plate, reader
+    return MODELS.get('vehicle'), MODELS.get('plate'), MODELS.get('ocr')
 
 def format_plate_number(text):
     print(f"Formatting plate number: {text}")
-    
-    text = re.sub(r'[^A-Z0-9]', '', text.upper())
-    
-    char_substitutions = {
-        'O': '0', '0': 'O',
-        'I': '1', '1': 'I',
-        'Z': '2', '2': 'Z',
-        'J': '3', '3': 'J',
-        'A': '4', '4': 'A',
-        'S': '5', '5': 'S',
-        'G': '6', '6': 'G',
-        'T': '7', '7': 'T',
-        'B': '8', '8': 'B',
-        'l': '1', '1': 'l',
-    }
-    
-    def validate_section(text_part, expected_type='alpha'):
-        result = ''
-        for char in text_part:
-            if expected_type == 'alpha' and char.isdigit():
-                if char in char_substitutions:
-                    result += char_substitutions[char]
-                else:
-                    result += char
-            elif expected_type == 'num' and not char.isdigit():
-                if char in char_substitutions:
-                    result += char_substitutions[char]
-                else:
-                    result += char
-            else:
-                result += char
-        return result
-    
-    number_match = re.search(r'[0-9]{1,4}', text)
-    if number_match:
-        number_start = number_match.start()
-        number_end = number_match.end()
-        
-        prefix = text[:number_start]
-        numbers = text[number_start:number_end]
-        suffix = text[number_end:]
-        
-        prefix = validate_section(prefix, 'alpha')[:2]  
-        numbers = validate_section(numbers, 'num')[:4]  
-        suffix = validate_section(suffix, 'alpha')[:3]  
-        
-        if prefix and numbers:
-            region_check = get_closest_region_code(prefix)
-            if region_check:
-                formatted_plate = f"{region_check} {numbers} {suffix}".strip()
-                print(f"Formatted plate number: {formatted_plate}")
-                return formatted_plate
-    
-    parts = re.findall(r'[A-Z]+|[0-9]+', text)
-    if len(parts) >= 3:
-        prefix = validate_section(parts[0], 'alpha')[:2]  
-        numbers = validate_section(parts[1], 'num')[:4]   
-        suffix = validate_section(''.join(parts[2:]), 'alpha')[:3]  
-        
-        if prefix and numbers:
-            region_check = get_closest_region_code(prefix)
-            if region_check:
-                formatted_plate = f"{region_check} {numbers} {suffix}".strip()
-                print(f"Formatted plate number: {formatted_plate}")
-                return formatted_plate
-    
+
+    plate = PLATE_NORMALIZER.split(text)
+    if plate:
+        formatted_plate = "{} {} {}".format(*plate).strip()
+        print(f"Formatted plate number: {formatted_plate}")
+        return formatted_plate
+
     print("No valid Indonesian plate format found")
     return None
 
 def get_closest_region_code(code):
-    print(f"Getting closest region code for '{code}'")
-    if code in REGION_CODES:
-        print(f"Exact match found: {code}")
-        return code
-    matches = get_close_matches(code, REGION_CODES.keys(), n=1, cutoff=0.6)
-    closest_match = matches[0] if matches else None
-    if closest_match:
-        print(f"Closest match found: {closest_match}")
-    else:
-        print("No close match found.")
-    return closest_match
+    return PLATE_NORMALIZER.region(code)
 
 def detect_plates(model_plate, image):
     print("Detecting plates in the image.")
-    results = model_plate(image)
+    return plates_from_result(model_plate(image)[0], image)
+
+def plates_from_result(result, image):
     plate_detections = []
     
-    for box in results[0].boxes:
+    for box in result.boxes:
         x, y, w, h = box.xywh[0]
         conf = box.conf[0]
         margin = 0.0
@@ -181,59 +229,135 @@ def enhance_plate_image(plate_img):
     
     return binary
 
-def process_image(model_vehicle, model_plate, reader, image_path):
-    print(f"Processing image: {image_path}")
-    img = cv2.imread(str(image_path))
-    if img is None:
-        raise ValueError(f"Could not read image: {image_path}")
-    
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    result_img = img_rgb.copy()
-
-    vehicles = model_vehicle(img)
-    for box in vehicles[0].boxes:
-        x, y, w, h = box.xywh[0]
-        conf = box.conf[0]
-        x1 = max(0, int(x - w / 2))
-        y1 = max(0, int(y - h / 2))
-        x2 = min(img.shape[1], int(x + w / 2))
-        y2 = min(img.shape[0], int(y + h / 2))
-
-        cv2.rectangle(result_img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+def process_image(model_vehicle, model_plate, reader, image):
+    if isinstance(image, np.ndarray):
+        img = image
+    else:
+        print(f"Processing image: {image}")
+        img = cv2.imread(str(image))
+        if img is None:
+            raise ValueError(f"Could not read image: {image}")
+
+    return process_images(model_vehicle, model_plate, reader, [img])[0]
+
+def process_images(model_vehicle, model_plate, reader, images):
+    """
+    process_image over several decoded images at once: each detector runs a
+    single batched call and the plate crops of all images are read together.
+    Returns one (result_img, plate_texts) per image, result_img in BGR.
+    """
+    return [(draw_detections(img, vehicle_boxes, plate_texts), plate_texts)
+            for img, (vehicle_boxes, plate_texts) in zip(images, detect_images(model_vehicle, model_plate, reader,
+                                                                              images))]
+
+def detect_images(model_vehicle, model_plate, reader, images):
+    """
+    Detection and OCR half of process_images, without any drawing. Returns one
+    (vehicle_boxes, plate_texts) per image, which is all draw_detections needs
+    to render the annotated image later.
+    """
+    vehicle_results = model_vehicle(images, verbose=False)
+    outputs = []
+
+    for img, vehicles, plate_texts in zip(images, vehicle_results, read_image_plates(model_plate, reader, images)):
+        vehicle_boxes = []
+        for box in vehicles.boxes:
+            x, y, w, h = box.xywh[0]
+            conf = box.conf[0]
+            x1 = max(0, int(x - w / 2))
+            y1 = max(0, int(y - h / 2))
+            x2 = min(img.shape[1], int(x + w / 2))
+            y2 = min(img.shape[0], int(y + h / 2))
+            vehicle_boxes.append((x1, y1, x2, y2, float(conf)))
+
+        outputs.append((vehicle_boxes, plate_texts))
+
+    return outputs
+
+def draw_detections(img, vehicle_boxes, plate_texts):
+    # Drawn in BGR for the encoder; vehicles stay blue and plates green
+    result_img = img.copy()
+
+    for x1, y1, x2, y2, conf in vehicle_boxes:
+        cv2.rectangle(result_img, (x1, y1), (x2, y2), (255, 0, 0), 2)
         label = f"Vehicle {conf:.2f}"
         cv2.putText(result_img, label, (x1, max(y1 - 10, 20)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
 
-    plates = detect_plates(model_plate, img)
-    plate_texts = []
-
-    for plate in plates:
+    for plate in plate_texts:
         x1, y1, x2, y2 = plate['bbox']
-        
-        if x2 > x1 and y2 > y1:
-            plate_crop = img[y1:y2, x1:x2]
-            if plate_crop.size > 0:
-                plate_text = read_plate(reader, plate_crop)
-                
-                if plate_text == "Tidak Terbaca":
-                    region_name = "Unknown"
-                else:
-                    region_code = plate_text.split()[0]
-                    region_name = REGION_CODES.get(region_code, "Unknown")
+        plate_text = plate['text']
+        region_name = plate['region']
 
-                plate_texts.append({
-                    'text': plate_text,
-                    'conf': plate['conf'],
-                    'region': region_name
-                })
-
-                cv2.rectangle(result_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.rectangle(result_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        label = f"{plate_text} - {region_name}" if plate_text != "Tidak Terbaca" else "Tidak Terbaca"
+        cv2.putText(result_img, label, (x1, max(y1 - 10, 20)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
 
-                label = f"{plate_text} - {region_name}" if plate_text != "Tidak Terbaca" else "Tidak Terbaca"
-                cv2.putText(result_img, label, (x1, max(y1 - 10, 20)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+    return result_img
+
+def read_image_plates(model_plate, reader, images):
+    """
+    Plate detection and OCR only, batched over images: no vehicle detector and
+    no rendering. Returns one plate_texts list per image, each entry carrying
+    the plate's bbox next to its text, conf and region.
+    """
+    plate_results = model_plate(images, verbose=False)
+
+    crops = []
+    for i, (img, plates) in enumerate(zip(images, plate_results)):
+        for plate in plates_from_result(plates, img):
+            x1, y1, x2, y2 = plate['bbox']
+            if x2 > x1 and y2 > y1:
+                plate_crop = img[y1:y2, x1:x2]
+                if plate_crop.size > 0:
+                    crops.append((i, plate, plate_crop))
+
+    outputs = [[] for _ in images]
+    texts = read_plates(reader, [plate_crop for _, _, plate_crop in crops])
+
+    for (i, plate, _), plate_text in zip(crops, texts):
+        if plate_text == "Tidak Terbaca":
+            region_name = "Unknown"
+        else:
+            region_code = plate_text.split()[0]
+            region_name = REGION_CODES.get(region_code, "Unknown")
+
+        outputs[i].append({
+            'text': plate_text,
+            'conf': plate['conf'],
+            'region': region_name,
+            'bbox': plate['bbox']
+        })
 
-    return result_img, plate_texts
+    return outputs
+
+def best_plate(plate_texts):
+    """
+    The plate a gate should act on: readable plates first, then the most
+    confident detection.
+    """
+    if not plate_texts:
+        return None
+    return max(plate_texts, key=lambda plate: (plate['text'] != "Tidak Terbaca", float(plate['conf'])))
+
+def read_plates(reader, plate_imgs):
+    """
+    read_plate for every crop of a batch, in OCR_MODE. In early_exit mode the
+    crops are read in rounds, one OCR call per variant across all crops still
+    unresolved; the other modes read every variant of every crop at once. With
+    an OCR process pool each such call is spread across the workers.
+    """
+    if len(plate_imgs) < 2:
+        return [read_plate(reader, plate_img) for plate_img in plate_imgs]
+
+    plate_imgs = [cv2.rotate(plate_img, cv2.ROTATE_90_CLOCKWISE) if plate_img.shape[0] > plate_img.shape[1]
+                  else plate_img for plate_img in plate_imgs]
+    read = (lambda images: OCR_POOL.variant_texts(images, rec_only=OCR_RECOGNITION_ONLY, mode=OCR_MODE)
+            ) if OCR_POOL else None
+    results = batch_plate_texts(reader, plate_imgs, enhance_plate_image, format_plate_number,
+                                rec_only=OCR_RECOGNITION_ONLY, read=read, mode=OCR_MODE)
+    return [formatted or fallback or "Tidak Terbaca" for formatted, fallback in results]
 
 def read_plate(ocr, plate_img):
     print("Reading plate text using OCR.")
@@ -242,33 +366,15 @@ def read_plate(ocr, plate_img):
     if rows > cols:
         plate_img = cv2.rotate(plate_img, cv2.ROTATE_90_CLOCKWISE)
     
-    attempts = [
-        plate_img,  
-        enhance_plate_image(plate_img),  
-        cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY),  
-        cv2.threshold(cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY), 
-                      0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],  
-    ]
-    
-    all_texts = []
+    attempts = plate_variants(plate_img, enhance_plate_image)
     fallback_result = None  
 
-    for img in attempts:
-        img_data = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if len(img.shape) == 3 else img
-        results = ocr.ocr(img_data, cls=True)
-        
-        if results and results[0]:
-            sorted_results = sorted(results[0], key=lambda x: x[0][0][1])
-            
-            combined_text = ''
-            for result in sorted_results:
-                text = result[1][0]
-                if len(text) > len(combined_text):
-                    combined_text += text
-            
-            all_texts.append(combined_text)
-    
-    for text in all_texts:
+    if OCR_POOL:
+        texts = OCR_POOL.plate_texts(attempts, mode=OCR_MODE, rec_only=OCR_RECOGNITION_ONLY)
+    else:
+        texts = iter_plate_texts(ocr, attempts, mode=OCR_MODE, rec_only=OCR_RECOGNITION_ONLY)
+
+    for text in texts:
         formatted = format_plate_number(text)
         if formatted:
             print(f"Successfully detected plate: {formatted}")
@@ -292,6 +398,9 @@ def apply_nms(detections, conf_threshold=0.5, iou_threshold=0.4):
     if len(detections) == 0:
         return []
 
+    import torch
+    from torchvision.ops import nms
+
     boxes = torch.tensor([d[0:4] for d in detections], dtype=torch.float32)
     scores = torch.tensor([d[4] for d in detections], dtype=torch.float32)
 
@@ -343,6 +452,16 @@ def write_csv(results, output_path):
                     ))
 
 def get_multiple_plate_readings(reader, plate_img):
+    if OCR_POOL or OCR_RECOGNITION_ONLY:
+        height, width = plate_img.shape[:2]
+        variants = [plate_img, enhance_plate_image(plate_img)]
+        for angle in [-5, 5]:
+            matrix = cv2.getRotationMatrix2D((width/2, height/2), angle, 1)
+            variants.append(cv2.warpAffine(plate_img, matrix, (width, height)))
+        if OCR_POOL:
+            return OCR_POOL.readings(variants, rec_only=OCR_RECOGNITION_ONLY)
+        return [(text, score) for text, score in recognize(reader, variants, rgb=False) if text]
+
     readings = []
     
     result = reader.ocr(plate_img, cls=True)
@@ -365,98 +484,7 @@ def get_multiple_plate_readings(reader, plate_img):
     return readings
 
 def validate_plate_format(text):
-    pattern = r'^[A-Z]{1,2}\s*\d{1,4}\s*[A-Z]{1,3}$'
-    return bool(re.match(pattern, text))
-
-def clean_value(value):
-    cleaned_value = re.sub(r'np\.float64\((.*?)\)', r'\1', value)
-    cleaned_value = cleaned_value.replace(',', '').strip()  
-    return float(cleaned_value)
-
-def interpolate_bounding_boxes(data):
-    frame_numbers = np.array([int(row['frame_nmr']) for row in data])
-    vehicle_ids = np.array([int(float(row['vehicle_id'])) for row in data])
-    
-    vehicle_bboxes = np.array([list(map(float, [clean_value(val) for val in row['vehicle_bbox'][1:-1].split()])) for row in data])
-    
-    license_plate_bboxes = np.array([list(map(float, [clean_value(val) for val in row['license_plate_bbox'][1:-1].split()])) for row in data])
-    license_plate_texts = [row['license_number'] for row in data]
-    
-    license_number_scores = []
-    for row in data:
-        try:
-            license_number_score = float(row['license_number_score']) if row['license_number_score'] else 0.0  # Default to 0.0 if empty
-        except ValueError:
-            license_number_score = 0.0  
-        license_number_scores.append(license_number_score)
-    
-    interpolated_data = []
-    unique_vehicle_ids = np.unique(vehicle_ids)
-    
-    for vehicle_id in unique_vehicle_ids:
-        frame_numbers_ = [p['frame_nmr'] for p in data if int(float(p['vehicle_id'])) == int(float(vehicle_id))]
-        print(f"Processing vehicle ID: {vehicle_id}, Frames: {frame_numbers_}")
-
-        vehicle_mask = vehicle_ids == vehicle_id
-        vehicle_frame_numbers = frame_numbers[vehicle_mask]
-        vehicle_bboxes_interpolated = []
-        license_plate_bboxes_interpolated = []
-        license_number_interpolated = []
-        license_number_score_interpolated = []  
-
-        first_frame_number = vehicle_frame_numbers[0]
-        
-        for i in range(len(vehicle_bboxes[vehicle_mask])):
-            frame_number = vehicle_frame_numbers[i]
-            vehicle_bbox = vehicle_bboxes[vehicle_mask][i]
-            license_plate_bbox = license_plate_bboxes[vehicle_mask][i]
-            license_number = license_plate_texts[vehicle_mask.nonzero()[0][i]]  
-            license_number_score = license_number_scores[vehicle_mask.nonzero()[0][i]]  
-
-            if i > 0:
-                prev_frame_number = vehicle_frame_numbers[i-1]
-                prev_vehicle_bbox = vehicle_bboxes_interpolated[-1]
-                prev_license_plate_bbox = license_plate_bboxes_interpolated[-1]
-                prev_license_number = license_number_interpolated[-1]
-                prev_license_number_score = license_number_score_interpolated[-1]  
-
-                if frame_number - prev_frame_number > 1:
-                    frames_gap = frame_number - prev_frame_number
-                    x = np.array([prev_frame_number, frame_number])
-                    x_new = np.linspace(prev_frame_number, frame_number, num=frames_gap, endpoint=False)
-                    
-                    interp_func = interp1d(x, np.vstack((prev_vehicle_bbox, vehicle_bbox)), axis=0, kind='linear')
-                    interpolated_vehicle_bboxes = interp_func(x_new)
-                    
-                    interp_func = interp1d(x, np.vstack((prev_license_plate_bbox, license_plate_bbox)), axis=0, kind='linear')
-                    interpolated_license_plate_bboxes = interp_func(x_new)
-
-                    vehicle_bboxes_interpolated.extend(interpolated_vehicle_bboxes[1:])
-                    license_plate_bboxes_interpolated.extend(interpolated_license_plate_bboxes[1:])
-                    
-                    license_number_interpolated.extend([license_number] * (frames_gap - 1))
-                    license_number_score_interpolated.extend([license_number_score] * (frames_gap - 1))  
-
-            vehicle_bboxes_interpolated.append(vehicle_bbox)
-            license_plate_bboxes_interpolated.append(license_plate_bbox)
-            license_number_interpolated.append(license_number)
-            license_number_score_interpolated.append(license_number_score)  
-
-        for i in range(len(vehicle_bboxes_interpolated)):
-            frame_number = first_frame_number + i
-            row = {
-                'frame_nmr': str(frame_number),
-                'vehicle_id': str(vehicle_id),
-                'vehicle_bbox': ' '.join(map(str, vehicle_bboxes_interpolated[i])),
-                'license_plate_bbox': ' '.join(map(str, license_plate_bboxes_interpolated[i])),
-                'license_number': license_number_interpolated[i],
-                'license_plate_bbox_score': '0' if str(frame_number) not in frame_numbers_ else \
-                    [p['license_plate_bbox_score'] for p in data if int(p['frame_nmr']) == frame_number and int(float(p['vehicle_id'])) == int(float(vehicle_id))][0],
-                'license_number_score': str(license_number_score_interpolated[i])  
-            }
-            interpolated_data.append(row)
-
-    return interpolated_data
+    return bool(PLATE_FORMAT.match(text))
 
 def draw_border(img, top_left, bottom_right, color=(0, 0, 255), thickness=3, line_length_x=200, line_length_y=200):
     x1, y1 = top_left
@@ -476,222 +504,380 @@ def draw_border(img, top_left, bottom_right, color=(0, 0, 255), thickness=3, lin
 
     return img
 
-@app.route('/api/process-video', methods=['POST'])
-def upload_file_video():
-    results = {}
-    valid_license_plates = {}
-    mot_tracker = Sort()
-    
-    model_vehicle, model_plate, reader = model()
-    
-    if 'video' not in request.files:
-        return jsonify({'error': 'No video file provided'}), 400
-    
-    video = request.files['video']
+def run_detectors(model_vehicle, model_plate, frames):
+    """
+    Runs each detector once over a batch of frames and returns per-frame
+    results in the same order.
+    """
+    if not frames:
+        return [], []
+    return model_vehicle(frames, verbose=False), model_plate(frames, verbose=False)
+
+def read_plate_crop(reader, license_plate_crop):
+    plate_readings = get_multiple_plate_readings(reader, license_plate_crop)
     
-    timestamp = str(int(time.time()))
-    file_extension = video.filename.split('.')[-1]
-    video_filename = f"{timestamp}.{file_extension}"
+    if plate_readings:
+        best_reading = max(plate_readings, key=lambda x: x[1])
+        license_plate_text = best_reading[0]
+        license_plate_text_score = best_reading[1]
+        formatted_plate_text = format_plate_number(license_plate_text)
+    else:
+        license_plate_text = "Tidak Terbaca"
+        license_plate_text_score = 0
+        formatted_plate_text = None
+    return license_plate_text, license_plate_text_score, formatted_plate_text
+
+def analyze_frame(frame, vehicle_detections, license_plates, mot_tracker, ocr_scheduler, ocr_pool, reader):
+    """
+    Inference-side half of a frame: tracking, plate to vehicle association and
+    OCR submission. Returns the frame's plates with a pending OCR future (or
+    None when the scheduler skipped the crop) for collect_frame to resolve.
+    """
+    vehicles = [2, 3, 5, 7]
+    plates = []
+
+    detections_ = [d[:5] for d in vehicle_detections.boxes.data.tolist() if int(d[5]) in vehicles]
     
-    UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
-    OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
+    track_ids = mot_tracker.update(np.array(detections_))
     
-    # gcs_video_path = f"uploads/{video_filename}"
-    local_video_path = UPLOAD_FOLDER / video_filename
-    video.save(local_video_path)
-    gcs_video_path = upload_to_gcs(local_video_path, f"uploads/{video_filename}")
+    plates_detections = apply_nms([lp[:5] for lp in license_plates.boxes.data.tolist()])
     
-    print(f"Received file: {video_filename}")
+    for license_plate in plates_detections:
+        x1, y1, x2, y2, score = license_plate
+        xvehicle1, yvehicle1, xvehicle2, yvehicle2, vehicle_id = get_vehicle(license_plate, track_ids)
+        
+        if vehicle_id != -1:
+            license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2)]
+            if license_plate_crop.size == 0:
+                continue
+            quality = plate_quality(license_plate_crop, score)
+
+            reading = None
+            if ocr_scheduler.should_read(vehicle_id, quality):
+                # The crop is copied into a ring slot, released once its read
+                # is done, so OCR never looks into a frame the encoder owns
+                slot = CROP_RING.put(license_plate_crop)
+                if slot is None:
+                    reading = ocr_pool.submit(read_plate_crop, reader, license_plate_crop.copy())
+                else:
+                    reading = ocr_pool.submit(read_plate_crop, reader, slot.array)
+                    reading.add_done_callback(lambda _, slot=slot: slot.release())
 
-    print(gcs_video_path)
-    
-    cap = cv2.VideoCapture(local_video_path)
+            plates.append((vehicle_id, [xvehicle1, yvehicle1, xvehicle2, yvehicle2], [x1, y1, x2, y2],
+                           score, reading))
 
-    vehicles = [2, 3, 5, 7]
+    return plates
 
-    frame_nmr = -1
-    ret = True
+def collect_frame(frame_nmr, plates, valid_license_plates, detections, ocr_scheduler):
+    """
+    Ordered half of a frame: waits for its OCR results, keeps the best valid
+    reading per vehicle and logs the frame's detections.
+    """
+    frame_results = {}
 
-    while ret:
-        frame_nmr += 1
-        ret, frame = cap.read()
-        if ret:
-            results[frame_nmr] = {}
-            
-            detections = model_vehicle(frame)[0]
-            detections_ = [d[:5] for d in detections.boxes.data.tolist() if int(d[5]) in vehicles]
-            
-            track_ids = mot_tracker.update(np.array(detections_))
-            
-            license_plates = model_plate(frame)[0]
-            plates_detections = apply_nms([lp[:5] for lp in license_plates.boxes.data.tolist()])
-            
-            for license_plate in plates_detections:
-                x1, y1, x2, y2, score = license_plate
-                xvehicle1, yvehicle1, xvehicle2, yvehicle2, vehicle_id = get_vehicle(license_plate, track_ids)
-                
-                if vehicle_id != -1:
-                    license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2)]
-                    plate_readings = get_multiple_plate_readings(reader, license_plate_crop)
-                    
-                    if plate_readings:
-                        best_reading = max(plate_readings, key=lambda x: x[1])
-                        license_plate_text = best_reading[0]
-                        license_plate_text_score = best_reading[1]
-                        formatted_plate_text = format_plate_number(license_plate_text)
-                    else:
-                        license_plate_text = "Tidak Terbaca"
-                        license_plate_text_score = 0
-                        formatted_plate_text = None
-                                
-                    if vehicle_id in valid_license_plates:
-                        previous_plate, previous_score = valid_license_plates[vehicle_id]
-                        if formatted_plate_text and license_plate_text_score > previous_score:
-                            valid_license_plates[vehicle_id] = (formatted_plate_text, license_plate_text_score)
-                        else:
-                            formatted_plate_text = previous_plate
-                    elif formatted_plate_text:
-                        valid_license_plates[vehicle_id] = (formatted_plate_text, license_plate_text_score)
+    for vehicle_id, vehicle_bbox, plate_bbox, score, reading in plates:
+        if reading is not None:
+            license_plate_text, license_plate_text_score, formatted_plate_text = reading.result()
+            ocr_scheduler.record(vehicle_id, formatted_plate_text, license_plate_text_score)
+        else:
+            # Track already has its best reading or this crop is not better
+            # than the ones already read; reuse what the track has
+            license_plate_text, license_plate_text_score = valid_license_plates.get(vehicle_id, ("Tidak Terbaca", 0))
+            formatted_plate_text = None
                     
-                    results[frame_nmr][vehicle_id] = {
-                        'vehicle': {'bbox': [xvehicle1, yvehicle1, xvehicle2, yvehicle2]},
-                        'license_plate': {
-                            'bbox': [x1, y1, x2, y2],
-                            'bbox_score': score,
-                            'text': formatted_plate_text if formatted_plate_text else license_plate_text,
-                            'text_score': license_plate_text_score
-                        }
-                    }
-
-    output_results_folder = OUTPUT_FOLDER / 'results'
-    output_results_folder.mkdir(parents=True, exist_ok=True)
-    
-    csv_filename = f"{timestamp}.csv"
-    csv_path = os.path.join(OUTPUT_FOLDER, 'results', csv_filename)
-    write_csv(results, csv_path)
-    
-    with open(csv_path, 'r') as file:
-        reader = csv.DictReader(file)
-        data = list(reader)
-
-    interpolated_data = interpolate_bounding_boxes(data)
-
-    interpolated_csv_filename = f"{timestamp}_interpol.csv"
-    interpolated_csv_path = output_results_folder / interpolated_csv_filename
+        if vehicle_id in valid_license_plates:
+            previous_plate, previous_score = valid_license_plates[vehicle_id]
+            if formatted_plate_text and license_plate_text_score > previous_score:
+                valid_license_plates[vehicle_id] = (formatted_plate_text, license_plate_text_score)
+            else:
+                formatted_plate_text = previous_plate
+        elif formatted_plate_text:
+            valid_license_plates[vehicle_id] = (formatted_plate_text, license_plate_text_score)
+        
+        frame_results[vehicle_id] = (
+            vehicle_bbox,
+            plate_bbox,
+            score,
+            formatted_plate_text if formatted_plate_text else license_plate_text,
+            license_plate_text_score
+        )
+
+    for vehicle_id, (vehicle_bbox, plate_bbox, score, text, text_score) in frame_results.items():
+        detections.append(frame_nmr, vehicle_id, vehicle_bbox, plate_bbox, score, text, text_score)
+
+def draw_overlays(frame, overlays):
+    vehicle_bboxes, plate_bboxes, license_numbers, text_scores = overlays
+    vehicle_bboxes = vehicle_bboxes.astype(np.int32).tolist()
+    plate_bboxes = plate_bboxes.astype(np.int32).tolist()
+
+    for vehicle_bbox, plate_bbox, license_number, text_score in zip(vehicle_bboxes, plate_bboxes,
+                                                                    license_numbers, text_scores):
+        vehicle_x1, vehicle_y1, vehicle_x2, vehicle_y2 = vehicle_bbox
+        draw_border(
+            frame, 
+            (vehicle_x1, vehicle_y1), 
+            (vehicle_x2, vehicle_y2), 
+            (255, 0, 0), 
+            25,
+            line_length_x=200, 
+            line_length_y=200
+        )
+
+        x1, y1, x2, y2 = plate_bbox
+        cv2.rectangle(
+            frame, 
+            (x1, y1), 
+            (x2, y2), 
+            (0, 255, 0), 
+            12
+        )
+        
+        if license_number:
+            cv2.putText(
+                frame,
+                f"LP: {license_number}",
+                (x1, y1 - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.8,
+                (255, 255, 255),
+                2
+            )
+
+        if text_score:
+            cv2.putText(
+                frame,
+                f"Score: {text_score}",
+                (x1, y2 + 30),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.8,
+                (255, 255, 255),
+                2
+            )
+
+def process_video(local_video_path, timestamp, export_csv=False, stride=None, adaptive=None, progress=None):
+    """
+    Single decode pass through a staged pipeline: a decoder thread, detector
+    inference on this thread, an OCR worker pool and an encoder thread that
+    collects results in frame order, renders and writes. Stages are joined by
+    bounded queues, so in-flight frames stay capped at roughly
+    2 * VIDEO_QUEUE_FRAMES + 4 * VIDEO_BATCH_SIZE + 2 * VIDEO_LOOKAHEAD_FRAMES
+    whatever the video length. progress(frames_processed, total_frames) is called after
+    every encoded frame.
+    """
+    valid_license_plates = {}
+    mot_tracker = VectorSort() if VIDEO_TRACKER == 'vector' else Sort()
+    # Set by the inference stage while the tracker holds tracks; the tracker
+    # itself is only ever touched on that stage's thread
+    tracking = threading.Event()
+    detections = DetectionLog()
+    ocr_scheduler = PlateOCRScheduler(max_reads=OCR_MAX_READS_PER_TRACK, accept_score=OCR_ACCEPT_SCORE,
+                                      validate=validate_plate_format)
     
-    header = ['frame_nmr', 'vehicle_id', 'vehicle_bbox', 'license_plate_bbox', 'license_plate_bbox_score', 'license_number', 'license_number_score']
-    with open(interpolated_csv_path, 'w', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=header)
-        writer.writeheader()
-        writer.writerows(interpolated_data)
+    model_vehicle, model_plate, reader = model()
 
-    results_viz = pd.read_csv(interpolated_csv_path)
+    cap = cv2.VideoCapture(str(local_video_path))
 
     output_video_filename = f"{timestamp}_output.mp4"
     output_video_path = OUTPUT_FOLDER / output_video_filename
-    gcs_video_output_path = f"output/{output_video_filename}"
 
     logger.info(f"Attempting to write output video to: {output_video_path}")
 
     # fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    # Replace current VideoWriter initialization with:
     fourcc = cv2.VideoWriter_fourcc(*'avc1')
     fps = cap.get(cv2.CAP_PROP_FPS)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    # out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     out = cv2.VideoWriter(str(output_video_path), fourcc, fps, (width, height), isColor=True)
 
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    frame_nmr = -1
-    ret = True
-    
-    while ret:
-        ret, frame = cap.read()
-        frame_nmr += 1
-        
-        if ret:
-            df_ = results_viz[results_viz['frame_nmr'] == frame_nmr]
-            
-            for row_indx in range(len(df_)):
-                vehicle_x1, vehicle_y1, vehicle_x2, vehicle_y2 = ast.literal_eval(
-                    df_.iloc[row_indx]['vehicle_bbox'].replace('[ ', '[').replace('   ', ' ').replace('  ', ' ').replace(' ', ',')
-                )
-                draw_border(
-                    frame, 
-                    (int(vehicle_x1), int(vehicle_y1)), 
-                    (int(vehicle_x2), int(vehicle_y2)), 
-                    (255, 0, 0), 
-                    25,
-                    line_length_x=200, 
-                    line_length_y=200
-                )
-
-                x1, y1, x2, y2 = ast.literal_eval(
-                    df_.iloc[row_indx]['license_plate_bbox'].replace('[ ', '[').replace('   ', ' ').replace('  ', ' ').replace(' ', ',')
-                )
-                cv2.rectangle(
-                    frame, 
-                    (int(x1), int(y1)), 
-                    (int(x2), int(y2)), 
-                    (0, 255, 0), 
-                    12
-                )
-                
-                license_number = df_.iloc[row_indx]['license_number']
-                text_score = df_.iloc[row_indx]['license_number_score']
-                
-                if license_number:
-                    cv2.putText(
-                        frame,
-                        f"LP: {license_number}",
-                        (int(x1), int(y1) - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.8,
-                        (255, 255, 255),
-                        2
-                    )
-
-                if text_score:
-                    cv2.putText(
-                        frame,
-                        f"Score: {text_score}",
-                        (int(x1), int(y2) + 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.8,
-                        (255, 255, 255),
-                        2
-                    )
-
-            out.write(frame)
-
-    out.release()
-    cap.release()
-    cv2.destroyAllWindows()
-
-    if os.path.exists(output_video_path):
-        upload_to_gcs(output_video_path, gcs_video_output_path)
-    else:
+    renderer = StreamingRenderer(detections, draw_overlays, out.write, lookahead=VIDEO_LOOKAHEAD_FRAMES)
+    adaptive = VIDEO_ADAPTIVE_STRIDE if adaptive is None else adaptive
+    sampler = FrameSampler(stride=stride or (VIDEO_IDLE_STRIDE if adaptive else VIDEO_STRIDE), adaptive=adaptive)
+
+    pipeline = Pipeline()
+    decoded = pipeline.pipe(VIDEO_QUEUE_FRAMES)
+    analyzed = pipeline.pipe(VIDEO_QUEUE_FRAMES)
+    ocr_pool = ThreadPoolExecutor(max_workers=VIDEO_OCR_WORKERS, thread_name_prefix='video-ocr')
+
+    def decode():
+        frame_nmr = -1
+        while not pipeline.stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_nmr += 1
+            infer = sampler.should_infer(frame_nmr, frame, active_tracks=tracking.is_set())
+            decoded.put((frame_nmr, frame, infer))
+        decoded.close()
+
+    def flush(entries):
+        vehicle_results, plate_results = run_detectors(
+            model_vehicle, model_plate, [frame for _, frame, infer in entries if infer])
+        results = iter(zip(vehicle_results, plate_results))
+
+        # Tracker updates still happen strictly in frame order
+        for frame_nmr, frame, infer in entries:
+            plates = []
+            if infer:
+                vehicle_detections, license_plates = next(results)
+                plates = analyze_frame(frame, vehicle_detections, license_plates, mot_tracker, ocr_scheduler,
+                                       ocr_pool, reader)
+            else:
+                mot_tracker.advance()
+            if len(mot_tracker.trackers) > 0:
+                tracking.set()
+            else:
+                tracking.clear()
+            analyzed.put((frame_nmr, frame, plates))
+
+    def infer():
+        batcher = FrameBatcher(flush, batch_size=VIDEO_BATCH_SIZE, max_latency=VIDEO_BATCH_LATENCY_MS / 1000.0)
+        for frame_nmr, frame, sample in decoded:
+            batcher.add(frame_nmr, frame, sample)
+        batcher.close()
+        analyzed.close()
+
+    def encode():
+        for frame_nmr, frame, plates in analyzed:
+            collect_frame(frame_nmr, plates, valid_license_plates, detections, ocr_scheduler)
+            renderer.push(frame_nmr, frame)
+            if progress:
+                progress(frame_nmr + 1, total_frames)
+        renderer.close()
+
+    try:
+        pipeline.spawn('video-decode', decode)
+        pipeline.spawn('video-encode', encode)
+        pipeline.run(infer)
+        pipeline.join()
+    finally:
+        pipeline.stop.set()
+        ocr_pool.shutdown(wait=True, cancel_futures=True)
+        out.release()
+        cap.release()
+
+    logger.info(f"Ran detectors on {sampler.sampled} of {total_frames} frames")
+    logger.info(f"Ran OCR on {ocr_scheduler.reads} of {ocr_scheduler.candidates} plate crops")
+
+    csv_path = None
+    interpolated_csv_path = None
+    if export_csv:
+        output_results_folder = OUTPUT_FOLDER / 'results'
+        output_results_folder.mkdir(parents=True, exist_ok=True)
+
+        csv_path = output_results_folder / f"{timestamp}.csv"
+        write_detections_csv(csv_path, zip(*detections.columns()), brackets=True)
+
+        interpolated_csv_path = output_results_folder / f"{timestamp}_interpol.csv"
+        write_detections_csv(interpolated_csv_path, zip(*interpolate_detections(*detections.columns())))
+
+    return output_video_path, csv_path, interpolated_csv_path
+
+def run_video_job(local_video_path, video_filename, timestamp, export_csv=False, stride=None, adaptive=None,
+                  progress=None):
+    gcs_video_path = upload_to_gcs(local_video_path, f"uploads/{video_filename}")
+    print(gcs_video_path)
+
+    output_video_path, csv_path, interpolated_csv_path = process_video(local_video_path, timestamp, export_csv,
+                                                                       stride=stride, adaptive=adaptive,
+                                                                       progress=progress)
+    gcs_video_output_path = f"output/{output_video_path.name}"
+
+    if not os.path.exists(output_video_path):
         logger.error(f"Output video file not found: {output_video_path}")
-        return jsonify({'error': 'Failed to generate output video'}), 500
+        raise RuntimeError('Failed to generate output video')
 
+    upload_to_gcs(output_video_path, gcs_video_output_path)
     print(gcs_video_output_path)
-    
-    return jsonify({
+
+    return {
         'message': 'Video processed successfully', 
-        'csv_path': str(csv_path),
-        'interpolated_csv_path': str(interpolated_csv_path),
+        'csv_path': str(csv_path) if csv_path else None,
+        'interpolated_csv_path': str(interpolated_csv_path) if interpolated_csv_path else None,
         'output_video_path': str(output_video_path),
         'processed_video': f"https://storage.googleapis.com/{GCS_BUCKET_NAME}/{gcs_video_output_path}"
-    }), 200
+    }
+
+@app.route('/api/process-video', methods=['POST'])
+def upload_file_video():
+    if 'video' not in request.files:
+        return jsonify({'error': 'No video file provided'}), 400
+    
+    video = request.files['video']
+    
+    timestamp = str(int(time.time()))
+    file_extension = video.filename.split('.')[-1]
+    video_filename = f"{timestamp}.{file_extension}"
+    
+    UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
+    OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
+    
+    local_video_path = UPLOAD_FOLDER / video_filename
+    video.save(local_video_path)
+    
+    print(f"Received file: {video_filename}")
+
+    export_csv = request.form.get('export_csv', str(VIDEO_EXPORT_CSV)).lower() == 'true'
+    stride = request.form.get('stride', type=int)
+    adaptive = request.form.get('adaptive')
+    adaptive = adaptive.lower() == 'true' if adaptive is not None else None
+    try:
+        job = VIDEO_JOBS.submit(run_video_job, local_video_path, video_filename, timestamp, export_csv,
+                                stride=stride, adaptive=adaptive)
+    except JobQueueFull as e:
+        return jsonify({'error': 'Too many videos waiting to be processed', 'details': str(e)}), 503
+
+    # Legacy blocking behaviour for callers that still expect the result inline
+    if request.form.get('wait', request.args.get('wait', 'false')).lower() == 'true':
+        job.future.result()
+        if job.status == 'failed':
+            return jsonify({'error': job.error}), 500
+        return jsonify(job.result), 200
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f"/api/video-jobs/{job.id}",
+        'result_url': f"/api/video-jobs/{job.id}/result"
+    }), 202
+
+@app.route('/api/video-jobs/<job_id>', methods=['GET'])
+def video_job_status(job_id):
+    job = VIDEO_JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Job {job_id} not found"}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/api/video-jobs/<job_id>/result', methods=['GET'])
+def video_job_result(job_id):
+    job = VIDEO_JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Job {job_id} not found"}), 404
+    if job.status == 'failed':
+        return jsonify({'error': job.error, **job.snapshot()}), 500
+    if job.status != 'done':
+        return jsonify(job.snapshot()), 202
+    return jsonify(job.result), 200
 
 
 # Google Cloud Storage Setup
 GCS_BUCKET_NAME = 'apnr-output-bucket'  # Replace with your GCS bucket name
-storage_client = storage.Client()
-
-# Create a GCS bucket reference
-bucket = storage_client.get_bucket(GCS_BUCKET_NAME)
+_gcs_bucket = None
+_gcs_lock = threading.Lock()
+
+def gcs_bucket():
+    """
+    GCS bucket reference, created on first use so start-up does not wait for
+    the google.cloud import and the credential lookup.
+    """
+    global _gcs_bucket
+    if _gcs_bucket is None:
+        with _gcs_lock:
+            if _gcs_bucket is None:
+                with STARTUP.phase('gcs client'):
+                    from google.cloud import storage
+                    _gcs_bucket = storage.Client().get_bucket(GCS_BUCKET_NAME)
+    return _gcs_bucket
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -705,48 +891,115 @@ OUTPUT_FOLDER.mkdir(exist_ok=True)
 
 # Helper function to upload files to Google Cloud Storage
 def upload_to_gcs(local_file_path, destination_blob_name):
-    blob = bucket.blob(destination_blob_name)
+    blob = gcs_bucket().blob(destination_blob_name)
     blob.upload_from_filename(local_file_path)
     logger.info(f"File uploaded to GCS as {destination_blob_name}")
-    return f"https://storage.googleapis.com/{GCS_BUCKET_NAME}/{destination_blob_name}"
+    return gcs_url(destination_blob_name)
+
+def gcs_url(blob_name):
+    return f"https://storage.googleapis.com/{GCS_BUCKET_NAME}/{blob_name}"
 
 # Helper function to download files from GCS (for processed results)
 def download_from_gcs(source_blob_name, local_file_path):
-    blob = bucket.blob(source_blob_name)
+    blob = gcs_bucket().blob(source_blob_name)
     blob.download_to_filename(local_file_path)
     logger.info(f"File downloaded from GCS to {local_file_path}")
 
 # Function to process uploaded images
-def process_uploaded_image(image_file):
+def cached_result(namespace, image_data, img, compute):
+    """
+    compute() unless RESULT_CACHE already holds a result for this upload or a
+    near-identical one. A byte-identical upload that arrives while the first
+    is still being computed (a backend retry) waits for that computation and
+    gets its result instead of starting another one.
+    """
+    if image_data is None:
+        return compute()
+    if RESULT_CACHE is None:
+        return IN_FLIGHT.do((namespace, content_hash(image_data)), compute)
+
+    key = RESULT_CACHE.key(namespace, image_data, img)
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        def compute_and_store():
+            value = compute()
+            RESULT_CACHE.put(key, value)
+            return value
+        result = IN_FLIGHT.do((namespace, key.digest), compute_and_store)
+    return result
+
+def detect_image(img, image_data=None):
+    """
+    Detections of a single decoded image, micro-batched when enabled.
+    """
+    def compute():
+        if IMAGE_BATCHER:
+            return IMAGE_BATCHER.submit(img)
+        model_vehicle, model_plate, reader = model()
+        return detect_images(model_vehicle, model_plate, reader, [img])[0]
+    return cached_result('image', image_data, img, compute)
+
+def annotate_mode(value):
+    # Per-request 'annotate' form field: true draws now, false skips the image
+    if value is None:
+        return ANNOTATE_IMAGES
+    return 'eager' if value.lower() == 'true' else 'off'
+
+def render_deferred(path, image_data, detections):
+    IMAGE_ENCODER.save(draw_detections(decode_image(image_data), *detections), path)
+
+def detect_plate_texts(img, image_data=None):
+    """
+    Plate-only counterpart of process_image for a single decoded image.
+    """
+    def compute():
+        if PLATE_BATCHER:
+            return PLATE_BATCHER.submit(img)
+        return read_image_plates(MODELS.get('plate'), MODELS.get('ocr'), [img])[0]
+    return cached_result('plate', image_data, img, compute)
+
+def process_uploaded_image(image_file, plate_only=False, annotate=None):
     timestamp = str(int(time.time()))
     file_extension = image_file.filename.split('.')[-1]
     file_name = f"{timestamp}.{file_extension}"
     
-    # Save the uploaded file locally
+    # Decode straight from the request; the raw upload is archived locally and
+    # pushed to Google Cloud Storage in the background
     local_path = UPLOAD_FOLDER / file_name
-    image_file.save(local_path)
-
-    # Upload the file to Google Cloud Storage
-    gcs_image_path = upload_to_gcs(local_path, f"uploads/{file_name}")
-
-    # Load models
-    model_vehicle, model_plate, reader = model()
+    image_data = image_file.read()
+    img = decode_image(image_data)
+    if img is None:
+        return jsonify({"error": "Could not decode image"}), 400
+    ARCHIVER.submit(image_data, local_path,
+                    callback=lambda path: upload_to_gcs(path, f"uploads/{file_name}"))
 
     try:
-        result_img, plate_texts = process_image(model_vehicle, model_plate, reader, local_path)
-
-        # Save processed image locally for GCS upload
-        processed_image_local_path = OUTPUT_FOLDER / f"processed_{file_name}"
-        plt.imsave(str(processed_image_local_path), result_img)
-
-        # Upload processed image to Google Cloud Storage
-        gcs_processed_image_path = upload_to_gcs(processed_image_local_path, f"processed/{file_name}")
-        
-        print(gcs_processed_image_path)
+        gcs_processed_image_path = None
+        if plate_only:
+            # No vehicle detector pass and no annotated image
+            plate_texts = detect_plate_texts(img, image_data)
+        else:
+            vehicle_boxes, plate_texts = detect_image(img, image_data)
+
+            mode = annotate_mode(annotate)
+            processed_name = IMAGE_ENCODER.filename(f"processed_{timestamp}")
+            if mode == 'eager':
+                # Encoded, saved locally and uploaded to Google Cloud Storage
+                # on the encoder thread. /output waits for a pending write on
+                # this instance and fetches processed/<name> from GCS on others
+                IMAGE_ENCODER.submit(draw_detections(img, vehicle_boxes, plate_texts), OUTPUT_FOLDER / processed_name,
+                                     callback=lambda path: upload_to_gcs(path, f"processed/{processed_name}"))
+                gcs_processed_image_path = f"/output/{processed_name}"
+                
+                print(gcs_processed_image_path)
+            elif mode == 'lazy':
+                # Drawn on the first fetch of this URL, by this instance
+                DEFERRED_RENDERS.add(processed_name, image_data, (vehicle_boxes, plate_texts))
+                gcs_processed_image_path = f"/output/{processed_name}"
         
         response = {
             "detected_plates": [plate['text'] for plate in plate_texts],
-            "processed_image": gcs_processed_image_path,  # URL of processed image in GCS
+            "processed_image": gcs_processed_image_path,  # /output URL of the annotated image
             "conf": [plate['conf'].item() for plate in plate_texts],
             "region": [plate['region'] for plate in plate_texts],
         }
@@ -772,12 +1025,84 @@ def upload_file():
             logger.error("No selected file")
             return jsonify({"error": "No selected file"}), 400
         
-        return process_uploaded_image(uploaded_file)
+        plate_only = request.form.get('plate_only', 'false').lower() == 'true'
+        return process_uploaded_image(uploaded_file, plate_only=plate_only, annotate=request.form.get('annotate'))
 
     except Exception as e:
         logger.error(f"Error during file upload: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/verify-plate', methods=['POST'])
+def verify_plate():
+    """
+    Fast path for the gate backend: plate detection and OCR only, no vehicle
+    detector and no annotated image. Returns the most relevant plate.
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({"error": "No image uploaded"}), 400
+
+        image_file = request.files['image']
+        file_extension = image_file.filename.split('.')[-1] if image_file.filename else 'jpg'
+        file_name = f"{str(int(time.time()))}.{file_extension}"
+
+        image_data = image_file.read()
+        img = decode_image(image_data)
+        if img is None:
+            return jsonify({"error": "Could not decode image"}), 400
+        ARCHIVER.submit(image_data, UPLOAD_FOLDER / file_name,
+                        callback=lambda path: upload_to_gcs(path, f"uploads/{file_name}"))
+
+        plate = best_plate(detect_plate_texts(img, image_data))
+        if plate is None or plate['text'] == "Tidak Terbaca":
+            return jsonify({
+                "plate_number": None,
+                "confidence": float(plate['conf']) if plate else 0.0,
+                "region": None,
+            })
+
+        return jsonify({
+            "plate_number": plate['text'],
+            "confidence": float(plate['conf']),
+            "region": plate['region'],
+        })
+
+    except Exception as e:
+        logger.error(f"Error verifying plate: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/track-frame', methods=['POST'])
+def track_frame():
+    """
+    One frame of a live gate camera: vehicle detection and tracking against
+    the earlier frames of the same camera_id. Track ids are per camera.
+    """
+    try:
+        camera_id = request.form.get('camera_id')
+        if not camera_id:
+            return jsonify({"error": "No camera_id given"}), 400
+        if 'image' not in request.files:
+            return jsonify({"error": "No image uploaded"}), 400
+
+        img = decode_image(request.files['image'].read())
+        if img is None:
+            return jsonify({"error": "Could not decode image"}), 400
+
+        vehicles = [2, 3, 5, 7]
+        vehicle_detections = MODELS.get('vehicle')(img, verbose=False)[0]
+        dets = [d[:5] for d in vehicle_detections.boxes.data.tolist() if int(d[5]) in vehicles]
+        tracks = STREAM_TRACKERS.update(camera_id, np.array(dets))
+
+        return jsonify({
+            "camera_id": camera_id,
+            "tracks": [{"track_id": int(track_id), "box": [float(x1), float(y1), float(x2), float(y2)]}
+                       for x1, y1, x2, y2, track_id in tracks.tolist()],
+        })
+
+    except Exception as e:
+        logger.error(f"Error tracking frame: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/output/<filename>')
 def output_file(filename):
     try:
@@ -789,14 +1114,18 @@ def output_file(filename):
             'jpg': 'image/jpeg',
             'jpeg': 'image/jpeg',
             'png': 'image/png',
+            'webp': 'image/webp',
             'csv': 'text/csv'
         }
         
         mimetype = mime_types.get(file_extension, 'application/octet-stream')
         
         local_path = OUTPUT_FOLDER / filename
+        IMAGE_ENCODER.wait(local_path)
+        if DEFERRED_RENDERS.materialize(local_path, render_deferred):
+            return send_file(local_path, mimetype=mimetype, as_attachment=False)
         
-        if file_extension in ['jpg', 'jpeg', 'png']:
+        if file_extension in ['jpg', 'jpeg', 'png', 'webp']:
             gcs_blob_path = f"processed/{filename}"
         elif file_extension in ['mp4', 'avi', 'mov']:
             gcs_blob_path = filename
@@ -813,10 +1142,67 @@ def output_file(filename):
         logger.error(f"Error serving file {filename}: {str(e)}")
         return jsonify({"error": f"File {filename} not found", "details": str(e)}), 404
     
+@app.route('/health', methods=['GET'])
+def health_check():
+    """
+    503 until every model has loaded, so load balancers and readiness probes
+    hold traffic back from a worker that is still starting. With LAZY_STARTUP
+    that lasts until the first request has loaded each model.
+    """
+    ready = MODELS.ready()
+    return jsonify({
+        'status': 'online' if ready else 'loading',
+        'service': 'OCR Service',
+        'version': '1.0.0',
+        'ready': ready,
+        'models': MODELS.status(),
+        'image_batching': IMAGE_BATCHER.stats() if IMAGE_BATCHER else None,
+        'plate_batching': PLATE_BATCHER.stats() if PLATE_BATCHER else None,
+        'result_cache': RESULT_CACHE.stats() if RESULT_CACHE else None,
+        'single_flight': IN_FLIGHT.stats(),
+        'stream_tracking': STREAM_TRACKERS.stats() if STREAM_TRACKERS else None,
+        'startup': STARTUP.report(),
+        'timestamp': time.time()
+    }), 200 if ready else 503
+
 @app.route('/')
 def index():
     return render_template('index.html')  
 
 
+def start_services():
+    """
+    Brings up this worker's OCR process pool, request batchers, stream trackers and, unless
+    LAZY_STARTUP, the models. Called from the entry points below instead of at
+    import: spawned OCR workers import this script as __mp_main__ and must not
+    start any of it again.
+    """
+    global OCR_POOL, CROP_RING, IMAGE_BATCHER, PLATE_BATCHER, STREAM_TRACKERS
+    if OCR_PROCESSES > 0:
+        OCR_POOL = OCRProcessPool(OCR_PROCESSES, ring_slots=CROP_RING_SLOTS, slot_bytes=CROP_SLOT_KB * 1024)
+    # Without a pool the crops never leave this process, so no shared memory
+    CROP_RING = OCR_POOL.ring if OCR_POOL else CropRing(slots=CROP_RING_SLOTS, slot_bytes=CROP_SLOT_KB * 1024,
+                                                        shared=False)
+    if IMAGE_BATCH_SIZE > 1:
+        IMAGE_BATCHER = MicroBatcher(lambda images: detect_images(*model(), images), max_batch=IMAGE_BATCH_SIZE,
+                                     max_wait=IMAGE_BATCH_WAIT_MS / 1000.0, name='image-batcher')
+        PLATE_BATCHER = MicroBatcher(lambda images: read_image_plates(MODELS.get('plate'), MODELS.get('ocr'), images),
+                                     max_batch=IMAGE_BATCH_SIZE, max_wait=IMAGE_BATCH_WAIT_MS / 1000.0,
+                                     name='plate-batcher')
+    STREAM_TRACKERS = StreamTrackers(idle_timeout=STREAM_IDLE_TIMEOUT, max_batch=STREAM_BATCH_SIZE,
+                                     max_wait=STREAM_BATCH_WAIT_MS / 1000.0)
+
+    # Without LAZY_STARTUP the models and the GCS client are brought up in the
+    # background right away; with it, each one loads on its first use
+    if not LAZY_STARTUP:
+        MODELS.preload()
+        threading.Thread(target=gcs_bucket, name='gcs-preload', daemon=True).start()
+    STARTUP.log()
+
+# gunicorn imports this module under its own name
+if __name__ not in ('__main__', '__mp_main__'):
+    start_services()
+
 if __name__ == '__main__':
+    start_services()
     app.run(debug=True)
\ No newline at end of file
@@ -1,16 +1,28 @@
-from flask import Flask, request, jsonify, send_file
-import cv2
-import numpy as np
-from pathlib import Path
-from ultralytics import YOLO
-import re
-from difflib import get_close_matches
-from matplotlib import pyplot as plt
 import time
-from flask_cors import CORS
+from util.startup import StartupProfile
+
+# Start-up is timed per import group and initialization phase (see /health).
+# ultralytics and paddleocr are only imported when the models load.
+STARTUP = StartupProfile()
+
+with STARTUP.phase('import flask'):
+    from flask import Flask, request, jsonify, send_file
+    from flask_cors import CORS
+with STARTUP.phase('import cv2/numpy'):
+    import cv2
+    import numpy as np
+from pathlib import Path
 import logging
 import os
-from paddleocr import PaddleOCR
+with STARTUP.phase('import util'):
+    from util.models import ModelRegistry, load_yolo, load_paddleocr, warmup_yolo, warmup_paddleocr
+    from util.archive import UploadArchiver, ImageEncoder, decode_image
+    from util.ocr import plate_variants, iter_plate_texts, batch_plate_texts
+    from util.ocr_pool import OCRProcessPool
+    from util.batching import MicroBatcher
+    from util.annotations import DeferredRenders
+    from util.cache import ResultCache, SingleFlight, content_hash
+    from util.plates import PlateNormalizer
 # from pyzbar.pyzbar import decode  # Commented out - not needed for plate detection
 import json
 
@@ -25,6 +37,60 @@ OUTPUT_FOLDER = Path('./output')
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 OUTPUT_FOLDER.mkdir(exist_ok=True)
 
+# Raw uploads are decoded in memory; writing them to UPLOAD_FOLDER is an
+# optional archival step that runs off the request thread.
+ARCHIVE_UPLOADS = os.environ.get('ARCHIVE_UPLOADS', 'true').lower() == 'true'
+ARCHIVER = UploadArchiver(enabled=ARCHIVE_UPLOADS)
+
+# Annotated images are encoded with OpenCV on a background thread, as
+# OUTPUT_IMAGE_FORMAT (jpg, png or webp); OUTPUT_MAX_SIDE > 0 downscales them
+# to previews whose longer side is at most that many pixels
+IMAGE_ENCODER = ImageEncoder(fmt=os.environ.get('OUTPUT_IMAGE_FORMAT', 'jpg'),
+                             quality=int(os.environ.get('OUTPUT_JPEG_QUALITY', '85')),
+                             max_side=int(os.environ.get('OUTPUT_MAX_SIDE', '0')) or None)
+
+# How read_plate runs OCR over its preprocessed variants: sequential,
+# early_exit (stop at the first valid plate) or batch (one recognizer batch)
+OCR_MODE = os.environ.get('OCR_MODE', 'early_exit')
+# Plate crops from best.pt are already tight, so PaddleOCR's own text detection
+# and angle classifier can be skipped and the crops fed to the recognizer
+OCR_RECOGNITION_ONLY = os.environ.get('OCR_RECOGNITION_ONLY', 'false').lower() == 'true'
+
+# With OCR_PROCESSES > 0, plate OCR runs in that many worker processes, each
+# with its own PaddleOCR, instead of on the request threads of this process
+OCR_PROCESSES = int(os.environ.get('OCR_PROCESSES', '0'))
+# Plate crops travel between stages and processes through a shared-memory ring
+# of CROP_RING_SLOTS slots of CROP_SLOT_KB each; larger crops are copied
+CROP_RING_SLOTS = int(os.environ.get('CROP_RING_SLOTS', '64'))
+CROP_SLOT_KB = int(os.environ.get('CROP_SLOT_KB', '256'))
+OCR_POOL = None  # started by start_services()
+
+# Annotated images are only needed by people looking at them: eager draws them
+# during the request, lazy (default) draws them on the first /output fetch from
+# the stored detections of the last ANNOTATE_PENDING_MAX requests, off never
+ANNOTATE_IMAGES = os.environ.get('ANNOTATE_IMAGES', 'lazy')
+DEFERRED_RENDERS = DeferredRenders(capacity=int(os.environ.get('ANNOTATE_PENDING_MAX', '256')))
+
+# Concurrent /api/process-image requests are gathered for up to
+# IMAGE_BATCH_WAIT_MS and run through the detectors and OCR as one batch of at
+# most IMAGE_BATCH_SIZE images; 1 disables batching
+IMAGE_BATCH_SIZE = int(os.environ.get('IMAGE_BATCH_SIZE', '8'))
+IMAGE_BATCH_WAIT_MS = float(os.environ.get('IMAGE_BATCH_WAIT_MS', '5'))
+IMAGE_BATCHER = None  # started by start_services()
+PLATE_BATCHER = None
+
+# Results of recent uploads are reused for byte-identical images for
+# RESULT_CACHE_TTL seconds; RESULT_CACHE_SIZE=0 disables the cache. A
+# non-negative RESULT_CACHE_PHASH_DISTANCE also reuses them for images whose
+# perceptual hash is within that many bits. This is opt-in: at a fixed gate
+# camera a different car can hash close to the previous one
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '256'))
+RESULT_CACHE = ResultCache(max_entries=RESULT_CACHE_SIZE, ttl=float(os.environ.get('RESULT_CACHE_TTL', '30')),
+                           max_distance=int(os.environ.get('RESULT_CACHE_PHASH_DISTANCE', '-1'))
+                           ) if RESULT_CACHE_SIZE > 0 else None
+# Identical uploads being processed at the same time share one computation
+IN_FLIGHT = SingleFlight()
+
 # Load region codes
 def region(file_path):
     region_codes = {}
@@ -36,80 +102,43 @@ def region(file_path):
     return region_codes
 
 REGION_CODES = region('region.txt')
+# Nearest region code of every 1-2 letter prefix, worked out once
+with STARTUP.phase('plate normalizer'):
+    PLATE_NORMALIZER = PlateNormalizer(REGION_CODES)
+
+MODELS = ModelRegistry(profile=STARTUP)
+MODELS.register('vehicle', lambda: load_yolo('../model/yolo11n.pt'), warmup=warmup_yolo)
+MODELS.register('plate', lambda: load_yolo('../model/best.pt'), warmup=warmup_yolo)
+MODELS.register('ocr', lambda: load_paddleocr(use_angle_cls=True, lang='en'), warmup=warmup_paddleocr)
+# Cold-start mode: with LAZY_STARTUP each model loads on the first request
+# that needs it instead of in the background right away
+LAZY_STARTUP = os.environ.get('LAZY_STARTUP', 'false').lower() == 'true'
 
 def model():
-    model_vehicle = YOLO('../model/yolo11n.pt')
-    model_plate = YOLO('../model/best.pt')
-    reader = PaddleOCR(use_angle_cls=True, lang='en')
-    return model_vehicle, model_plate, reader
+    return MODELS.get('vehicle'), MODELS.get('plate'), MODELS.get('ocr')
 
 def format_plate_number(text):
     logger.info(f"Formatting plate number: {text}")
-    text = re.sub(r'[^A-Z0-9]', '', text.upper())
-    
-    char_substitutions = {
-        'O': '0', '0': 'O',
-        'I': '1', '1': 'I',
-        'Z': '2', '2': 'Z',
-        'J': '3', '3': 'J',
-        'A': '4', '4': 'A',
-        'S': '5', '5': 'S',
-        'G': '6', '6': 'G',
-        'T': '7', '7': 'T',
-        'B': '8', '8': 'B',
-    }
-    
-    def validate_section(text_part, expected_type='alpha'):
-        result = ''
-        for char in text_part:
-            if expected_type == 'alpha' and char.isdigit():
-                if char in char_substitutions:
-                    result += char_substitutions[char]
-                else:
-                    result += char
-            elif expected_type == 'num' and not char.isdigit():
-                if char in char_substitutions:
-                    result += char_substitutions[char]
-                else:
-                    result += char
-            else:
-                result += char
-        return result
-    
-    number_match = re.search(r'[0-9]{1,4}', text)
-    if number_match:
-        number_start = number_match.start()
-        number_end = number_match.end()
-        
-        prefix = text[:number_start]
-        numbers = text[number_start:number_end]
-        suffix = text[number_end:]
-        
-        prefix = validate_section(prefix, 'alpha')
-        numbers = validate_section(numbers, 'num')
-        suffix = validate_section(suffix, 'alpha')
-        
-        if len(prefix) <= 2 and len(numbers) <= 4 and len(suffix) <= 3:
-            region_check = get_closest_region_code(prefix)
-            if region_check:
-                formatted_plate = f"{region_check} {numbers} {suffix}"
-                logger.info(f"Formatted plate number: {formatted_plate}")
-                return formatted_plate
-    
+
+    plate = PLATE_NORMALIZER.split(text, strict=True)
+    if plate:
+        formatted_plate = "{} {} {}".format(*plate)
+        logger.info(f"Formatted plate number: {formatted_plate}")
+        return formatted_plate
+
     logger.info("No valid Indonesian plate format found")
     return None
 
 def get_closest_region_code(code):
-    if code in REGION_CODES:
-        return code
-    matches = get_close_matches(code, REGION_CODES.keys(), n=1, cutoff=0.6)
-    return matches[0] if matches else None
+    return PLATE_NORMALIZER.region(code)
 
 def detect_plates(model_plate, image):
-    results = model_plate(image)
+    return plates_from_result(model_plate(image)[0], image)
+
+def plates_from_result(result, image):
     plate_detections = []
     
-    for box in results[0].boxes:
+    for box in result.boxes:
         x, y, w, h = box.xywh[0]
         conf = box.conf[0]
         margin = 0.0
@@ -146,100 +175,224 @@ def read_plate(reader, plate_img):
     if rows > cols:
         plate_img = cv2.rotate(plate_img, cv2.ROTATE_90_CLOCKWISE)
     
-    attempts = [
-        plate_img,  
-        enhance_plate_image(plate_img),  
-        cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY),  
-        cv2.threshold(cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY), 
-                      0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],  
-    ]
-    
-    all_texts = []
-    
-    for img in attempts:
-        img_data = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if len(img.shape) == 3 else img
-        results = reader.ocr(img_data, cls=True)
-        
-        if results and results[0]:
-            sorted_results = sorted(results[0], key=lambda x: x[0][0][1])
-            combined_text = ''
-            for result in sorted_results:
-                text = result[1][0]
-                if len(text) > len(combined_text):
-                    combined_text += text
-            all_texts.append(combined_text)
+    attempts = plate_variants(plate_img, enhance_plate_image)
     
-    for text in all_texts:
+    if OCR_POOL:
+        texts = OCR_POOL.plate_texts(attempts, mode=OCR_MODE, rec_only=OCR_RECOGNITION_ONLY)
+    else:
+        texts = iter_plate_texts(reader, attempts, mode=OCR_MODE, rec_only=OCR_RECOGNITION_ONLY)
+
+    for text in texts:
         formatted = format_plate_number(text)
         if formatted:
             return formatted
     
     return "Tidak Terbaca"
 
-def process_image(model_vehicle, model_plate, reader, image_path):
-    logger.info("Reading image")
-    img = cv2.imread(str(image_path))
-    if img is None:
-        raise ValueError(f"Could not read image: {image_path}")
-    
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    result_img = img_rgb.copy()
+def process_image(model_vehicle, model_plate, reader, image):
+    if isinstance(image, np.ndarray):
+        img = image
+    else:
+        logger.info("Reading image")
+        img = cv2.imread(str(image))
+        if img is None:
+            raise ValueError(f"Could not read image: {image}")
 
-    # Detect vehicles
-    vehicles = model_vehicle(img)
-    for box in vehicles[0].boxes:
-        x, y, w, h = box.xywh[0]
-        conf = box.conf[0]
-        x1 = max(0, int(x - w / 2))
-        y1 = max(0, int(y - h / 2))
-        x2 = min(img.shape[1], int(x + w / 2))
-        y2 = min(img.shape[0], int(y + h / 2))
+    return process_images(model_vehicle, model_plate, reader, [img])[0]
+
+def process_images(model_vehicle, model_plate, reader, images):
+    """
+    process_image over several decoded images at once: each detector runs a
+    single batched call and the plate crops of all images are read together.
+    Returns one (result_img, plate_texts) per image, result_img in BGR.
+    """
+    return [(draw_detections(img, vehicle_boxes, plate_texts), plate_texts)
+            for img, (vehicle_boxes, plate_texts) in zip(images, detect_images(model_vehicle, model_plate, reader,
+                                                                              images))]
 
-        cv2.rectangle(result_img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+def detect_images(model_vehicle, model_plate, reader, images):
+    """
+    Detection and OCR half of process_images, without any drawing. Returns one
+    (vehicle_boxes, plate_texts) per image, which is all draw_detections needs
+    to render the annotated image later.
+    """
+    vehicle_results = model_vehicle(images, verbose=False)
+    outputs = []
+
+    for img, vehicles, plate_texts in zip(images, vehicle_results, read_image_plates(model_plate, reader, images)):
+        vehicle_boxes = []
+        for box in vehicles.boxes:
+            x, y, w, h = box.xywh[0]
+            conf = box.conf[0]
+            x1 = max(0, int(x - w / 2))
+            y1 = max(0, int(y - h / 2))
+            x2 = min(img.shape[1], int(x + w / 2))
+            y2 = min(img.shape[0], int(y + h / 2))
+            vehicle_boxes.append((x1, y1, x2, y2, float(conf)))
+
+        outputs.append((vehicle_boxes, plate_texts))
+
+    return outputs
+
+def draw_detections(img, vehicle_boxes, plate_texts):
+    # Drawn in BGR for the encoder; vehicles stay blue and plates green
+    result_img = img.copy()
+
+    for x1, y1, x2, y2, conf in vehicle_boxes:
+        cv2.rectangle(result_img, (x1, y1), (x2, y2), (255, 0, 0), 2)
         label = f"Vehicle {conf:.2f}"
         cv2.putText(result_img, label, (x1, max(y1 - 10, 20)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
 
-    # Detect plates
-    plates = detect_plates(model_plate, img)
-    plate_texts = []
-
-    for plate in plates:
+    for plate in plate_texts:
         x1, y1, x2, y2 = plate['bbox']
-        
-        if x2 > x1 and y2 > y1:
-            plate_crop = img[y1:y2, x1:x2]
-            if plate_crop.size > 0:
-                plate_text = read_plate(reader, plate_crop)
-                
-                if plate_text == "Tidak Terbaca":
-                    region_name = "Unknown"
-                else:
-                    region_code = plate_text.split()[0]
-                    region_name = REGION_CODES.get(region_code, "Unknown")
-
-                plate_texts.append({
-                    'text': plate_text,
-                    'conf': plate['conf'],
-                    'region': region_name
-                })
-
-                cv2.rectangle(result_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                label = f"{plate_text} - {region_name}" if plate_text != "Tidak Terbaca" else "Tidak Terbaca"
-                cv2.putText(result_img, label, (x1, max(y1 - 10, 20)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-
-    return result_img, plate_texts
+        plate_text = plate['text']
+        region_name = plate['region']
+
+        cv2.rectangle(result_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        label = f"{plate_text} - {region_name}" if plate_text != "Tidak Terbaca" else "Tidak Terbaca"
+        cv2.putText(result_img, label, (x1, max(y1 - 10, 20)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+    return result_img
+
+def read_image_plates(model_plate, reader, images):
+    """
+    Plate detection and OCR only, batched over images: no vehicle detector and
+    no rendering. Returns one plate_texts list per image, each entry carrying
+    the plate's bbox next to its text, conf and region.
+    """
+    plate_results = model_plate(images, verbose=False)
+
+    crops = []
+    for i, (img, plates) in enumerate(zip(images, plate_results)):
+        for plate in plates_from_result(plates, img):
+            x1, y1, x2, y2 = plate['bbox']
+            if x2 > x1 and y2 > y1:
+                plate_crop = img[y1:y2, x1:x2]
+                if plate_crop.size > 0:
+                    crops.append((i, plate, plate_crop))
+
+    outputs = [[] for _ in images]
+    texts = read_plates(reader, [plate_crop for _, _, plate_crop in crops])
+
+    for (i, plate, _), plate_text in zip(crops, texts):
+        if plate_text == "Tidak Terbaca":
+            region_name = "Unknown"
+        else:
+            region_code = plate_text.split()[0]
+            region_name = REGION_CODES.get(region_code, "Unknown")
+
+        outputs[i].append({
+            'text': plate_text,
+            'conf': plate['conf'],
+            'region': region_name,
+            'bbox': plate['bbox']
+        })
+
+    return outputs
+
+def best_plate(plate_texts):
+    """
+    The plate a gate should act on: readable plates first, then the most
+    confident detection.
+    """
+    if not plate_texts:
+        return None
+    return max(plate_texts, key=lambda plate: (plate['text'] != "Tidak Terbaca", float(plate['conf'])))
+
+def read_plates(reader, plate_imgs):
+    """
+    read_plate for every crop of a batch, in OCR_MODE. In early_exit mode the
+    crops are read in rounds, one OCR call per variant across all crops still
+    unresolved; the other modes read every variant of every crop at once. With
+    an OCR process pool each such call is spread across the workers.
+    """
+    if len(plate_imgs) < 2:
+        return [read_plate(reader, plate_img) for plate_img in plate_imgs]
+
+    plate_imgs = [cv2.rotate(plate_img, cv2.ROTATE_90_CLOCKWISE) if plate_img.shape[0] > plate_img.shape[1]
+                  else plate_img for plate_img in plate_imgs]
+    read = (lambda images: OCR_POOL.variant_texts(images, rec_only=OCR_RECOGNITION_ONLY, mode=OCR_MODE)
+            ) if OCR_POOL else None
+    results = batch_plate_texts(reader, plate_imgs, enhance_plate_image, format_plate_number,
+                                rec_only=OCR_RECOGNITION_ONLY, read=read, mode=OCR_MODE)
+    return [formatted or "Tidak Terbaca" for formatted, fallback in results]
+
+def cached_result(namespace, image_data, img, compute):
+    """
+    compute() unless RESULT_CACHE already holds a result for this upload or a
+    near-identical one. A byte-identical upload that arrives while the first
+    is still being computed (a backend retry) waits for that computation and
+    gets its result instead of starting another one.
+    """
+    if image_data is None:
+        return compute()
+    if RESULT_CACHE is None:
+        return IN_FLIGHT.do((namespace, content_hash(image_data)), compute)
+
+    key = RESULT_CACHE.key(namespace, image_data, img)
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        def compute_and_store():
+            value = compute()
+            RESULT_CACHE.put(key, value)
+            return value
+        result = IN_FLIGHT.do((namespace, key.digest), compute_and_store)
+    return result
+
+def detect_image(img, image_data=None):
+    """
+    Detections of a single decoded image, micro-batched when enabled.
+    """
+    def compute():
+        if IMAGE_BATCHER:
+            return IMAGE_BATCHER.submit(img)
+        model_vehicle, model_plate, reader = model()
+        return detect_images(model_vehicle, model_plate, reader, [img])[0]
+    return cached_result('image', image_data, img, compute)
+
+def annotate_mode(value):
+    # Per-request 'annotate' form field: true draws now, false skips the image
+    if value is None:
+        return ANNOTATE_IMAGES
+    return 'eager' if value.lower() == 'true' else 'off'
+
+def render_deferred(path, image_data, detections):
+    IMAGE_ENCODER.save(draw_detections(decode_image(image_data), *detections), path)
+
+def detect_plate_texts(img, image_data=None):
+    """
+    Plate-only counterpart of process_image for a single decoded image.
+    """
+    def compute():
+        if PLATE_BATCHER:
+            return PLATE_BATCHER.submit(img)
+        return read_image_plates(MODELS.get('plate'), MODELS.get('ocr'), [img])[0]
+    return cached_result('plate', image_data, img, compute)
 
 # API Endpoints
 @app.route('/health', methods=['GET'])
 def health_check():
+    """
+    503 until every model has loaded, so load balancers and readiness probes
+    hold traffic back from a worker that is still starting. With LAZY_STARTUP
+    that lasts until the first request has loaded each model.
+    """
+    ready = MODELS.ready()
     return jsonify({
-        'status': 'online',
+        'status': 'online' if ready else 'loading',
         'service': 'OCR Service',
         'version': '1.0.0',
+        'ready': ready,
+        'models': MODELS.status(),
+        'image_batching': IMAGE_BATCHER.stats() if IMAGE_BATCHER else None,
+        'plate_batching': PLATE_BATCHER.stats() if PLATE_BATCHER else None,
+        'result_cache': RESULT_CACHE.stats() if RESULT_CACHE else None,
+        'single_flight': IN_FLIGHT.stats(),
+        'startup': STARTUP.report(),
         'timestamp': time.time()
-    })
+    }), 200 if ready else 503
 
 @app.route('/api/process-image', methods=['POST'])
 def upload_file_image():
@@ -252,18 +405,31 @@ def upload_file_image():
         file_extension = image_file.filename.split('.')[-1]
         file_name = f"{timestamp}.{file_extension}"
         file_path = UPLOAD_FOLDER / file_name
-        
-        image_file.save(file_path)
 
-        model_vehicle, model_plate, reader = model()
-        result_img, plate_texts = process_image(model_vehicle, model_plate, reader, file_path)
-        
-        save_path = OUTPUT_FOLDER / f"processed_{file_name}"
-        plt.imsave(str(save_path), result_img)
+        image_data = image_file.read()
+        img = decode_image(image_data)
+        if img is None:
+            return jsonify({"error": "Could not decode image"}), 400
+        ARCHIVER.submit(image_data, file_path)
+
+        processed_image = None
+        if request.form.get('plate_only', 'false').lower() == 'true':
+            # No vehicle detector pass and no annotated image
+            plate_texts = detect_plate_texts(img, image_data)
+        else:
+            vehicle_boxes, plate_texts = detect_image(img, image_data)
+
+            mode = annotate_mode(request.form.get('annotate'))
+            if mode == 'eager':
+                processed_image = IMAGE_ENCODER.filename(f"processed_{timestamp}")
+                IMAGE_ENCODER.submit(draw_detections(img, vehicle_boxes, plate_texts), OUTPUT_FOLDER / processed_image)
+            elif mode == 'lazy':
+                processed_image = IMAGE_ENCODER.filename(f"processed_{timestamp}")
+                DEFERRED_RENDERS.add(processed_image, image_data, (vehicle_boxes, plate_texts))
 
         response = {
             "detected_plates": [plate['text'] for plate in plate_texts],
-            "processed_image": f"processed_{file_name}",
+            "processed_image": processed_image,
             "conf": [plate['conf'].item() for plate in plate_texts],
             "region": [plate['region'] for plate in plate_texts],
         }
@@ -274,6 +440,44 @@ def upload_file_image():
         logger.error(f"Error processing image: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/verify-plate', methods=['POST'])
+def verify_plate():
+    """
+    Fast path for the gate backend: plate detection and OCR only, no vehicle
+    detector and no annotated image. Returns the most relevant plate.
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({"error": "No image uploaded"}), 400
+
+        image_file = request.files['image']
+        file_extension = image_file.filename.split('.')[-1] if image_file.filename else 'jpg'
+        file_name = f"{str(int(time.time()))}.{file_extension}"
+
+        image_data = image_file.read()
+        img = decode_image(image_data)
+        if img is None:
+            return jsonify({"error": "Could not decode image"}), 400
+        ARCHIVER.submit(image_data, UPLOAD_FOLDER / file_name)
+
+        plate = best_plate(detect_plate_texts(img, image_data))
+        if plate is None or plate['text'] == "Tidak Terbaca":
+            return jsonify({
+                "plate_number": None,
+                "confidence": float(plate['conf']) if plate else 0.0,
+                "region": None,
+            })
+
+        return jsonify({
+            "plate_number": plate['text'],
+            "confidence": float(plate['conf']),
+            "region": plate['region'],
+        })
+
+    except Exception as e:
+        logger.error(f"Error verifying plate: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 # QR Scanning endpoint disabled - pyzbar not available on Windows
 # @app.route('/api/scan-qr', methods=['POST'])
 # def scan_qr_code():
@@ -289,10 +493,37 @@ def upload_file_image():
 def output_file(filename):
     try:
         file_path = OUTPUT_FOLDER / filename
+        IMAGE_ENCODER.wait(file_path)
+        DEFERRED_RENDERS.materialize(file_path, render_deferred)
         return send_file(file_path, as_attachment=False)
     except Exception as e:
         logger.error(f"Error serving file: {str(e)}")
         return jsonify({"error": str(e)}), 404
 
+def start_services():
+    """
+    Brings up this worker's OCR process pool, request batchers and, unless
+    LAZY_STARTUP, the models. Called from the entry points below instead of at
+    import: spawned OCR workers import this script as __mp_main__ and must not
+    start any of it again.
+    """
+    global OCR_POOL, IMAGE_BATCHER, PLATE_BATCHER
+    if OCR_PROCESSES > 0:
+        OCR_POOL = OCRProcessPool(OCR_PROCESSES, ring_slots=CROP_RING_SLOTS, slot_bytes=CROP_SLOT_KB * 1024)
+    if IMAGE_BATCH_SIZE > 1:
+        IMAGE_BATCHER = MicroBatcher(lambda images: detect_images(*model(), images), max_batch=IMAGE_BATCH_SIZE,
+                                     max_wait=IMAGE_BATCH_WAIT_MS / 1000.0, name='image-batcher')
+        PLATE_BATCHER = MicroBatcher(lambda images: read_image_plates(MODELS.get('plate'), MODELS.get('ocr'), images),
+                                     max_batch=IMAGE_BATCH_SIZE, max_wait=IMAGE_BATCH_WAIT_MS / 1000.0,
+                                     name='plate-batcher')
+    if not LAZY_STARTUP:
+        MODELS.preload()
+    STARTUP.log()
+
+# gunicorn imports this module under its own name
+if __name__ not in ('__main__', '__mp_main__'):
+    start_services()
+
 if __name__ == '__main__':
+    start_services()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
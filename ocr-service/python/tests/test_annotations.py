@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util.annotations import DeferredRenders  # noqa: E402
+
+
+def test_failed_render_is_retried(tmp_path):
+    renders = DeferredRenders()
+    renders.add('a.jpg', b'data', ('boxes',))
+    calls = []
+
+    def broken(path, image_data, detections):
+        calls.append(path.name)
+        raise RuntimeError('encode failed')
+
+    def render(path, image_data, detections):
+        calls.append(path.name)
+        path.write_bytes(image_data)
+
+    with pytest.raises(RuntimeError):
+        renders.materialize(tmp_path / 'a.jpg', broken)
+    assert renders.materialize(tmp_path / 'a.jpg', render)
+    assert renders.materialize(tmp_path / 'a.jpg', render)
+    assert calls == ['a.jpg', 'a.jpg']
+    assert not renders.materialize(tmp_path / 'missing.jpg', render)
+
+
+def test_renders_of_different_files_run_in_parallel(tmp_path):
+    renders = DeferredRenders()
+    for name in ('a.jpg', 'b.jpg'):
+        renders.add(name, b'data', ())
+    both_started = threading.Barrier(2, timeout=5)
+
+    def render(path, image_data, detections):
+        both_started.wait()
+        path.write_bytes(image_data)
+
+    threads = [threading.Thread(target=renders.materialize, args=(tmp_path / name, render))
+               for name in ('a.jpg', 'b.jpg')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (tmp_path / 'a.jpg').exists() and (tmp_path / 'b.jpg').exists()
+
+
+def test_concurrent_fetches_of_one_file_render_once(tmp_path):
+    renders = DeferredRenders()
+    renders.add('a.jpg', b'data', ())
+    calls = []
+
+    def render(path, image_data, detections):
+        calls.append(path.name)
+        time.sleep(0.05)
+        path.write_bytes(image_data)
+
+    threads = [threading.Thread(target=renders.materialize, args=(tmp_path / 'a.jpg', render)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ['a.jpg']
@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util import cache  # noqa: E402
+from util.cache import CacheKey, ResultCache, SingleFlight  # noqa: E402
+
+
+class FakeClock(object):
+    """
+    Stands in for the time module inside util.cache, so expiry is driven by
+    the test rather than by sleeping.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache, 'time', fake)
+    return fake
+
+
+def key(digest, phash=None, namespace='image'):
+    return CacheKey(namespace, digest, phash)
+
+
+def test_entries_expire_after_ttl(clock):
+    results = ResultCache(ttl=10.0)
+    results.put(key(b'a'), 'A')
+    clock.now += 9.9
+    assert results.get(key(b'a')) == 'A'
+    # A hit does not extend the lifetime
+    clock.now += 0.1
+    assert results.get(key(b'a')) is None
+
+    results.put(key(b'b'), 'B')
+    assert results.stats()['expired'] == 1
+    assert results.stats()['entries'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    results = ResultCache(max_entries=2)
+    results.put(key(b'a'), 'A')
+    results.put(key(b'b'), 'B')
+    assert results.get(key(b'a')) == 'A'
+    results.put(key(b'c'), 'C')
+
+    assert results.get(key(b'b')) is None
+    assert results.get(key(b'a')) == 'A'
+    assert results.get(key(b'c')) == 'C'
+    assert results.stats()['evictions'] == 1
+
+
+def test_perceptual_lookup_takes_the_closest_entry_within_distance(clock):
+    results = ResultCache(max_distance=2)
+    results.put(key(b'a', phash=0b0000), 'A')
+    results.put(key(b'b', phash=0b1110), 'B')
+    results.put(key(b'c', phash=0b1111, namespace='video'), 'C')
+
+    assert results.get(key(b'x', phash=0b0001)) == 'A'
+    assert results.get(key(b'y', phash=0b1111)) == 'B'
+    assert results.get(key(b'z', phash=0b10000111)) is None
+    # Exact hashes never match across namespaces, nor do perceptual ones
+    assert results.get(key(b'c')) is None
+    clock.now += results.ttl
+    assert results.get(key(b'x', phash=0b0001)) is None
+
+
+def test_keys_ignore_perceptual_hash_unless_enabled():
+    img = np.zeros((16, 16, 3), dtype=np.uint8)
+    assert ResultCache().key('image', b'data', img).phash is None
+    assert ResultCache(max_distance=0).key('image', b'data', img).phash is not None
+
+
+def test_stats_count_hits_and_misses(clock):
+    results = ResultCache(max_distance=1)
+    results.put(key(b'a', phash=0b0), 'A')
+    results.get(key(b'a', phash=0b0))
+    results.get(key(b'x', phash=0b1))
+    results.get(key(b'y', phash=0b111))
+
+    stats = results.stats()
+    assert (stats['exact_hits'], stats['perceptual_hits'], stats['misses']) == (1, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(0.667)
+    assert ResultCache().stats()['hit_rate'] == 0.0
+
+
+def run_together(flight, fn, callers=8):
+    """
+    Calls flight.do('key', fn) from `callers` threads. fn is held until every
+    other caller has joined the flight, then released. Returns each caller's
+    result, or the exception it raised.
+    """
+    release = threading.Event()
+
+    def held():
+        assert release.wait(5)
+        return fn()
+
+    def call():
+        try:
+            return flight.do('key', held)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(call) for _ in range(callers)]
+        deadline = time.monotonic() + 5
+        while flight.stats()['shared'] < callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        return [future.result() for future in futures]
+
+
+def test_single_flight_computes_once_for_concurrent_callers():
+    flight = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'result'
+
+    assert run_together(flight, compute) == ['result'] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {'started': 1, 'shared': 7, 'in_flight': 0}
+
+
+def test_single_flight_shares_the_leaders_exception():
+    flight = SingleFlight()
+    error = RuntimeError('inference failed')
+
+    def compute():
+        raise error
+
+    assert all(result is error for result in run_together(flight, compute))
+    assert flight.stats()['in_flight'] == 0
+    # The failure is not remembered
+    assert flight.do('key', lambda: 'retried') == 'retried'
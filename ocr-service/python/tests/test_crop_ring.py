@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util.crop_ring import CropRing  # noqa: E402
+
+
+def test_unshared_ring_allocates_no_shared_memory():
+    ring = CropRing(slots=2, slot_bytes=1024, shared=False)
+    assert ring.name is None
+    crop = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    slot = ring.put(crop)
+    assert np.array_equal(slot.array, crop)
+    assert ring.locate(slot.array) == slot.spec
+    slot.release()
+    ring.close()
+
+
+def test_shared_ring_is_unlinked_once():
+    ring = CropRing(slots=2, slot_bytes=1024)
+    path = os.path.join('/dev/shm', ring.name)
+    assert os.path.exists(path)
+    slot = ring.put(np.ones((4, 4), dtype=np.uint8))
+    ring.close()
+    ring.close()
+    assert not os.path.exists(path)
+    del slot
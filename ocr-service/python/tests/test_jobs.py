@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util.jobs import JobManager, JobQueueFull  # noqa: E402
+
+
+class StubJob(object):
+    """
+    Job function that reports progress, then waits to be released before
+    returning `result` or raising `error`.
+    """
+    def __init__(self, result='out.mp4', error=None):
+        self.result = result
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, frames, progress):
+        progress(0, frames)
+        self.started.set()
+        assert self.release.wait(5)
+        progress(frames)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture
+def manager():
+    jobs = JobManager(max_workers=1, max_pending=1)
+    yield jobs
+    jobs._executor.shutdown(wait=True)
+
+
+def test_job_runs_to_done(manager):
+    stub = StubJob()
+    job = manager.submit(stub, 40)
+    assert manager.get(job.id) is job
+
+    assert stub.started.wait(5)
+    snapshot = job.snapshot()
+    assert (snapshot['status'], snapshot['frames_processed'], snapshot['total_frames']) == ('running', 0, 40)
+
+    stub.release.set()
+    assert job.future.result(5) == 'out.mp4'
+    snapshot = job.snapshot()
+    assert (snapshot['status'], snapshot['frames_processed'], snapshot['total_frames']) == ('done', 40, 40)
+    assert job.result == 'out.mp4'
+    assert snapshot['error'] is None
+
+
+def test_failed_job_reports_its_error(manager):
+    stub = StubJob(error=RuntimeError('cannot open video'))
+    stub.release.set()
+    job = manager.submit(stub, 10)
+
+    job.future.result(5)
+    snapshot = job.snapshot()
+    assert snapshot['status'] == 'failed'
+    assert snapshot['error'] == 'cannot open video'
+    assert job.result is None
+
+
+def test_jobs_queue_behind_the_worker_until_full(manager):
+    first, second = StubJob(), StubJob(result='second.mp4')
+    running = manager.submit(first, 5)
+    assert first.started.wait(5)
+
+    queued = manager.submit(second, 5)
+    assert queued.snapshot()['status'] == 'queued'
+    with pytest.raises(JobQueueFull):
+        manager.submit(StubJob(), 5)
+
+    first.release.set()
+    second.release.set()
+    assert running.future.result(5) == 'out.mp4'
+    assert queued.future.result(5) == 'second.mp4'
+    assert manager.get('unknown') is None
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util.ocr import (OCR_MODES, batch_plate_texts, iter_plate_texts, ocr_batch, rec_batch,  # noqa: E402
+                      rec_results, recognize)
+
+
+class StubReader(object):
+    """
+    Answers like PaddleOCR 2.7: text detection finds one line covering the
+    whole image, and recognition of a list of images returns one
+    [(text, score)] per image. Each image is read as its own top-left pixel
+    value, so every text says which input it came from.
+    """
+    def ocr(self, img, det=True, rec=True, cls=True):
+        if not rec:
+            height, width = img.shape[:2]
+            return [[[[0, 0], [width, 0], [width, height], [0, height]]]]
+        return [[(f"T{int(np.asarray(crop).flat[0])}", 0.9)] for crop in img]
+
+
+def crops(count):
+    return [np.full((20, 60, 3), i, dtype=np.uint8) for i in range(1, count + 1)]
+
+
+def test_ocr_batch_reads_one_text_per_variant():
+    assert ocr_batch(StubReader(), crops(6)) == ['T1', 'T2', 'T3', 'T4', 'T5', 'T6']
+
+
+def test_recognize_returns_one_reading_per_image():
+    assert recognize(StubReader(), crops(4)) == [('T1', 0.9), ('T2', 0.9), ('T3', 0.9), ('T4', 0.9)]
+    assert rec_batch(StubReader(), crops(2)) == ['T1', 'T2']
+
+
+def test_batch_mode_reads_every_variant():
+    assert list(iter_plate_texts(StubReader(), crops(3), mode='batch', rec_only=True)) == ['T1', 'T2', 'T3']
+
+
+class ShortReader(StubReader):
+    """
+    Loses the last page of a list call, as PaddleOCR's page handling can.
+    """
+    def ocr(self, img, det=True, rec=True, cls=True):
+        results = super(ShortReader, self).ocr(img, det=det, rec=rec, cls=cls)
+        return results if not rec else results[:-1]
+
+
+def test_short_result_list_is_an_error():
+    with pytest.raises(ValueError):
+        recognize(ShortReader(), crops(3))
+    with pytest.raises(ValueError):
+        ocr_batch(ShortReader(), crops(3))
+
+
+def test_empty_pages_read_as_nothing():
+    assert rec_results([[('AB', 0.8)], None, []], 3) == [('AB', 0.8), ('', 0.0), ('', 0.0)]
+    assert rec_results(None, 2) == [('', 0.0), ('', 0.0)]
+
+
+class CountingReader(StubReader):
+    def __init__(self):
+        self.images = 0
+
+    def ocr(self, img, det=True, rec=True, cls=True):
+        if rec:
+            self.images += len(img) if isinstance(img, list) else 1
+        return super(CountingReader, self).ocr(img, det=det, rec=rec, cls=cls)
+
+
+@pytest.mark.parametrize('mode', OCR_MODES)
+def test_batch_plate_texts_reads_in_the_requested_mode(mode):
+    reader = CountingReader()
+    # Crop 1 is accepted on its first variant, crop 2 never is
+    accept = lambda text: text if text == 'T1' else None
+    results = batch_plate_texts(reader, crops(2), lambda img: img, accept, rec_only=True, mode=mode)
+
+    assert results[0] == ('T1', 'T1')
+    assert results[1][0] is None and results[1][1] is not None
+    # early_exit stops reading crop 1 after its first variant
+    assert reader.images == (5 if mode == 'early_exit' else 8)
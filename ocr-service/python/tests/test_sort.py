@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util.sort import Sort, VectorSort, associate_detections_to_trackers, synthetic_scene  # noqa: E402
+
+
+def track_ids(tracker, scene):
+    ids = set()
+    for dets in scene:
+        ids.update(tracker.update(dets)[:, 4].astype(int))
+    return ids
+
+
+def test_sort_instances_number_tracks_independently():
+    scene = synthetic_scene(8, 20)
+    first = track_ids(Sort(), scene)
+    # A second job, started after the first, numbers its tracks from 1 again
+    assert track_ids(Sort(), scene) == first
+    assert min(first) == 1
+
+
+@pytest.mark.parametrize('max_age,min_hits', [(1, 3), (5, 1)])
+def test_vector_sort_matches_sort(max_age, min_hits):
+    scene = synthetic_scene(30, 60, seed=3)
+    scene[10] = np.empty((0, 5))
+    sort, vector = Sort(max_age, min_hits), VectorSort(max_age, min_hits)
+    for frame, dets in enumerate(scene):
+        if frame % 7 == 3:
+            sort.advance()
+            vector.advance()
+            continue
+        expected, got = sort.update(dets), vector.update(dets)
+        assert got.shape == expected.shape
+        np.testing.assert_array_equal(got[:, 4], expected[:, 4])
+        np.testing.assert_allclose(got[:, :4], expected[:, :4], rtol=1e-7, atol=1e-6)
+    assert len(vector) == len(sort.trackers)
+
+
+def random_boxes(rng, count, span):
+    corner = rng.uniform(0, span, (count, 2))
+    size = rng.uniform(20, 150, (count, 2))
+    # Some boxes collapse to a line or a point
+    size[rng.random(count) < 0.1] *= [0, 1]
+    size[rng.random(count) < 0.05] = 0
+    return np.concatenate([corner, corner + size, rng.random((count, 1))], axis=1)
+
+
+def association_sets(detections, trackers, gated):
+    matches, unmatched_dets, unmatched_trks = associate_detections_to_trackers(detections, trackers, gated=gated)
+    return set(map(tuple, matches.tolist())), set(unmatched_dets.tolist()), set(unmatched_trks.tolist())
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_gated_association_matches_dense(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(25):
+        n_dets, n_trks = rng.integers(0, 40, 2)
+        span = rng.choice([200, 600, 2000])
+        trackers = random_boxes(rng, n_trks, span)
+        # Detections near the trackers plus a few new arrivals
+        near = trackers[rng.permutation(n_trks)[:n_dets]] + rng.normal(0, 10, (min(n_dets, n_trks), 5))
+        detections = np.concatenate([near, random_boxes(rng, n_dets - len(near), span)])
+        assert association_sets(detections, trackers, True) == association_sets(detections, trackers, False)
+
+
+def test_association_with_nothing_to_match():
+    boxes = random_boxes(np.random.default_rng(0), 3, 200)
+    for gated in (True, False):
+        assert association_sets(np.empty((0, 5)), boxes, gated) == (set(), set(), {0, 1, 2})
+        assert association_sets(boxes, np.empty((0, 5)), gated) == (set(), {0, 1, 2}, set())
+        assert association_sets(np.empty((0, 5)), np.empty((0, 5)), gated) == (set(), set(), set())
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util.video import DetectionLog, FrameSampler, interpolate_detections  # noqa: E402
+
+
+def frame(value):
+    return np.full((72, 128, 3), value, dtype=np.uint8)
+
+
+def test_sampler_background_follows_frames_while_tracking():
+    sampler = FrameSampler(stride=5, adaptive=True)
+    sampler.should_infer(0, frame(0))
+    # The scene changes while a track is live, then the track ends
+    for frame_nmr in range(1, 80):
+        assert sampler.should_infer(frame_nmr, frame(200), active_tracks=True)
+    sampled = [sampler.should_infer(frame_nmr, frame(200)) for frame_nmr in range(80, 100)]
+    assert sum(sampled) == 4
+
+
+def test_fixed_stride_samples_every_nth_frame():
+    sampler = FrameSampler(stride=3)
+    assert [sampler.should_infer(frame_nmr, frame(0)) for frame_nmr in range(7)] == \
+        [True, False, False, True, False, False, True]
+
+
+def box(frame_nmr):
+    # Moves linearly with the frame, so an interpolated box equals box(frame)
+    return [frame_nmr, 2 * frame_nmr, frame_nmr + 10, 2 * frame_nmr + 10]
+
+
+INTERPOLATION_CASES = [
+    # (detections as (frame, vehicle_id), max_gap, expected (frame, vehicle_id) rows)
+    ([], None, []),
+    ([(4, 1)], None, [(4, 1)]),
+    ([(4, 1), (4, 2)], 3, [(4, 1), (4, 2)]),
+    ([(0, 1), (3, 1)], None, [(0, 1), (1, 1), (2, 1), (3, 1)]),
+    ([(0, 1), (3, 1)], 2, [(0, 1), (1, 1), (2, 1), (3, 1)]),
+    ([(0, 1), (3, 1)], 1, [(0, 1), (3, 1)]),
+    ([(0, 1), (3, 1)], 0, [(0, 1), (3, 1)]),
+    ([(0, 1), (2, 1), (6, 1)], 1, [(0, 1), (1, 1), (2, 1), (6, 1)]),
+    ([(0, 1), (1, 2), (2, 1), (5, 2)], 2, [(0, 1), (1, 1), (2, 1), (1, 2), (5, 2)]),
+    ([(0, 1), (1, 2), (2, 1), (5, 2)], 3, [(0, 1), (1, 1), (2, 1), (1, 2), (2, 2), (3, 2), (4, 2), (5, 2)]),
+]
+
+
+@pytest.mark.parametrize('detections,max_gap,expected', INTERPOLATION_CASES)
+def test_interpolate_detections(detections, max_gap, expected):
+    log = DetectionLog(capacity=2)
+    for frame_nmr, vehicle_id in detections:
+        log.append(frame_nmr, vehicle_id, box(frame_nmr), box(frame_nmr), 0.8, f'V{vehicle_id}', 0.9)
+
+    frames, vehicle_ids, vehicle_bboxes, plate_bboxes, plate_scores, texts, text_scores = \
+        interpolate_detections(*log.columns(), max_gap=max_gap)
+
+    assert list(zip(frames.tolist(), vehicle_ids.tolist())) == expected
+    assert vehicle_bboxes.reshape(-1, 4).tolist() == [box(frame_nmr) for frame_nmr, _ in expected]
+    assert plate_bboxes.reshape(-1, 4).tolist() == [box(frame_nmr) for frame_nmr, _ in expected]
+    assert texts.tolist() == [f'V{vehicle_id}' for _, vehicle_id in expected]
+    # Only the detected frames keep their plate score
+    detected = set(detections)
+    assert plate_scores.tolist() == pytest.approx([0.8 if row in detected else 0.0 for row in expected])
+    assert text_scores.tolist() == pytest.approx([0.9] * len(expected))
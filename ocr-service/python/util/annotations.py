@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+# eager - draw and save the annotated image while handling the request
+# lazy  - keep the detections and draw the image on its first fetch
+# off   - no annotated image
+ANNOTATE_MODES = ('eager', 'lazy', 'off')
+
+
+class DeferredRenders(object):
+    """
+    Detections of recent image requests whose annotated output has not been
+    drawn yet, keyed by output filename. Each entry holds the encoded upload
+    and whatever the render callback needs, so nothing is decoded or drawn
+    unless the output is actually fetched. Only the newest `capacity` entries
+    are kept.
+    """
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._pending = OrderedDict()
+        self._rendering = {}
+        self._lock = threading.Lock()
+
+    def add(self, filename, image_data, detections):
+        with self._lock:
+            self._pending[filename] = (image_data, detections)
+            self._pending.move_to_end(filename)
+            while len(self._pending) > self.capacity:
+                evicted, _ = self._pending.popitem(last=False)
+                self._rendering.pop(evicted, None)
+
+    def materialize(self, path, render):
+        """
+        Makes sure the output at `path` exists, calling
+        render(path, image_data, detections) if it is still pending. Returns
+        False when the file is neither on disk nor pending.
+
+        Renders of different files run in parallel; concurrent fetches of the
+        same file wait for one render. The entry is only dropped once render
+        returns, so a failed render is retried on the next fetch.
+        """
+        with self._lock:
+            if path.name not in self._pending:
+                return path.exists()
+            lock = self._rendering.setdefault(path.name, threading.Lock())
+
+        with lock:
+            with self._lock:
+                entry = self._pending.get(path.name)
+            if entry is None:
+                # Rendered by the fetch this one waited for, or evicted
+                return path.exists()
+            render(path, *entry)
+            with self._lock:
+                if self._pending.get(path.name) is entry:
+                    del self._pending[path.name]
+                self._rendering.pop(path.name, None)
+            return True
@@ -0,0 +1,121 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def decode_image(data):
+    """
+    Decodes an encoded image (jpeg/png/...) held in memory into a BGR array,
+    the same layout cv2.imread returns.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+class UploadArchiver(object):
+    """
+    Writes raw uploads to disk on a background thread so persistence stays out
+    of the request's critical path. An optional callback runs after the write,
+    e.g. to push the archived file to cloud storage.
+    """
+    def __init__(self, enabled=True, max_workers=1):
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='archive')
+
+    def submit(self, data, file_path, callback=None):
+        if not self.enabled:
+            return None
+        return self._executor.submit(self._write, data, file_path, callback)
+
+    def _write(self, data, file_path, callback):
+        try:
+            with open(file_path, 'wb') as f:
+                f.write(data)
+            if callback is not None:
+                callback(file_path)
+        except Exception as e:
+            logger.error(f"Error archiving upload {file_path}: {str(e)}")
+            raise
+
+
+class ImageEncoder(object):
+    """
+    Encodes output images straight from BGR arrays with cv2.imencode and
+    writes them on a background thread. `fmt` is the file extension (jpg, png,
+    webp), `quality` applies to jpg and webp, and images whose longer side
+    exceeds `max_side` are downscaled first for a lighter preview.
+    """
+    def __init__(self, fmt='jpg', quality=85, max_side=None, max_workers=1):
+        self.fmt = fmt.lower().lstrip('.')
+        self.quality = quality
+        self.max_side = max_side
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='encode')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def filename(self, stem):
+        return f"{stem}.{self.fmt}"
+
+    def _params(self):
+        if self.fmt in ('jpg', 'jpeg'):
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        if self.fmt == 'webp':
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        if self.fmt == 'png':
+            return [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        return []
+
+    def encode(self, img):
+        if self.max_side:
+            rows, cols = img.shape[:2]
+            scale = self.max_side / max(rows, cols)
+            if scale < 1:
+                img = cv2.resize(img, (int(cols * scale), int(rows * scale)), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(f".{self.fmt}", img, self._params())
+        if not ok:
+            raise ValueError(f"Could not encode image as {self.fmt}")
+        return buffer
+
+    def save(self, img, file_path):
+        self.encode(img).tofile(str(file_path))
+
+    def submit(self, img, file_path, callback=None):
+        """
+        Encodes and writes img in the background; callback(file_path) runs
+        after the write, e.g. to upload the file.
+        """
+        future = self._executor.submit(self._write, img, file_path, callback)
+        with self._lock:
+            self._pending[str(file_path)] = future
+        future.add_done_callback(lambda _: self._done(str(file_path), future))
+        return future
+
+    def wait(self, file_path):
+        """
+        Blocks until a write submitted for file_path, if any, has finished.
+        """
+        with self._lock:
+            future = self._pending.get(str(file_path))
+        if future is not None:
+            future.exception()
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def _write(self, img, file_path, callback):
+        try:
+            self.save(img, file_path)
+            if callback is not None:
+                callback(file_path)
+        except Exception as e:
+            logger.error(f"Error writing image {file_path}: {str(e)}")
+            raise
@@ -0,0 +1,90 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher(object):
+    """
+    Gathers items submitted concurrently from request threads and hands them
+    to process(items) as one batch. A batch closes when it holds `max_batch`
+    items or `max_wait` seconds after its first item arrived. process must
+    return one result per item, in order; each submit() call blocks until its
+    own result is ready. If process raises, every request in that batch gets
+    the exception.
+    """
+    def __init__(self, process, max_batch=8, max_wait=0.005, name='batcher'):
+        self._process = process
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._compute_total = 0.0
+        self._compute_max = 0.0
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            try:
+                results = self._process([item for item, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} failed: {str(e)}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            self._record([started - enqueued for _, _, enqueued in batch], time.monotonic() - started)
+
+    def _record(self, waits, compute):
+        with self._lock:
+            self._requests += len(waits)
+            self._batches += 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+            self._compute_total += compute
+            self._compute_max = max(self._compute_max, compute)
+
+    def stats(self):
+        with self._lock:
+            requests = self._requests
+            batches = self._batches
+            return {
+                'requests': requests,
+                'batches': batches,
+                'mean_batch_size': round(requests / batches, 2) if batches else 0.0,
+                'queue_wait_ms': {
+                    'mean': round(1000 * self._wait_total / requests, 2) if requests else 0.0,
+                    'max': round(1000 * self._wait_max, 2),
+                },
+                'compute_ms': {
+                    'mean': round(1000 * self._compute_total / batches, 2) if batches else 0.0,
+                    'max': round(1000 * self._compute_max, 2),
+                },
+            }
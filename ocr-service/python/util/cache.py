@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def perceptual_hash(img, size=8):
+    """
+    64-bit difference hash: sign of the horizontal gradient of a 9x8 grayscale
+    thumbnail. Re-encoded or slightly different frames of the same scene land
+    within a few bits of each other.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class CacheKey(object):
+    def __init__(self, namespace, digest, phash):
+        self.namespace = namespace
+        self.digest = digest
+        self.phash = phash
+
+
+class ResultCache(object):
+    """
+    Pipeline results keyed by the exact content hash of the upload and,
+    optionally, by a perceptual hash within `max_distance` bits, so repeated
+    captures of the same parked car skip inference. Entries expire after `ttl`
+    seconds and the least recently used ones are evicted beyond `max_entries`.
+    Perceptual matching is off unless max_distance is non-negative.
+    """
+    def __init__(self, max_entries=256, ttl=30.0, max_distance=-1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'exact_hits': 0, 'perceptual_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def key(self, namespace, data, img):
+        phash = perceptual_hash(img) if self.max_distance >= 0 else None
+        return CacheKey(namespace, content_hash(data), phash)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry_key = (key.namespace, key.digest)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(entry_key)
+                self._counts['exact_hits'] += 1
+                return entry[2]
+
+            if key.phash is not None:
+                best = None
+                for candidate_key, (expires, phash, value) in reversed(self._entries.items()):
+                    if candidate_key[0] != key.namespace or phash is None or expires <= now:
+                        continue
+                    distance = (phash ^ key.phash).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, candidate_key, value)
+                        if distance == 0:
+                            break
+                if best is not None:
+                    self._entries.move_to_end(best[1])
+                    self._counts['perceptual_hits'] += 1
+                    return best[2]
+
+            self._counts['misses'] += 1
+            return None
+
+    def put(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry_key = (key.namespace, key.digest)
+            self._entries[entry_key] = (now + self.ttl, key.phash, value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts['evictions'] += 1
+
+    def _expire(self, now):
+        # Lookups skip expired entries; they are dropped here, on insert. A hit
+        # does not extend an entry's lifetime
+        expired = [entry_key for entry_key, (expires, _, _) in self._entries.items() if expires <= now]
+        for entry_key in expired:
+            del self._entries[entry_key]
+        self._counts['expired'] += len(expired)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            counts['entries'] = len(self._entries)
+        hits = counts['exact_hits'] + counts['perceptual_hits']
+        lookups = hits + counts['misses']
+        counts['hit_rate'] = round(hits / lookups, 3) if lookups else 0.0
+        return counts
+
+
+class SingleFlight(object):
+    """
+    Runs at most one computation per key at a time. Callers that arrive while a
+    key is in flight wait for that computation and share its result, or its
+    exception, instead of starting their own.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counts = {'started': 0, 'shared': 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._counts['started'] += 1
+            else:
+                self._counts['shared'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            counts['in_flight'] = len(self._calls)
+        return counts
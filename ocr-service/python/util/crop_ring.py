@@ -0,0 +1,118 @@
+import atexit
+import threading
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+class CropSlot(object):
+    """
+    One crop held in a CropRing. `array` is a view into the shared block and
+    stays valid until the last reference is released.
+    """
+    def __init__(self, ring, index, shape, dtype):
+        self.ring = ring
+        self.index = index
+        self.array = np.ndarray(shape, dtype=dtype, buffer=ring.buffer, offset=index * ring.slot_bytes)
+
+    @property
+    def spec(self):
+        return (self.index * self.ring.slot_bytes, self.array.shape, self.array.dtype.str)
+
+    def retain(self):
+        self.ring.retain(self.index)
+        return self
+
+    def release(self):
+        self.ring.release(self.index)
+
+
+class CropRing(object):
+    """
+    Fixed-size slots in one shared-memory block, used to hand plate crops from
+    the detector stage to OCR. The owning process allocates slots and keeps a
+    reference count per slot; a slot is reused once its count drops to zero.
+    Other processes attach by name and read crops in place from a slot spec
+    (offset, shape, dtype), so a crop is copied once, into its slot, however
+    many stages or processes look at it.
+
+    With shared=False the slots live in ordinary process memory, for callers
+    that never hand crops to another process. An owned shared block is
+    unlinked on close() or, failing that, at interpreter exit.
+    """
+    def __init__(self, slots=64, slot_bytes=256 * 1024, name=None, shared=True):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        self._shm = None
+        if self.owner:
+            self._refs = [0] * slots
+            self._free = list(range(slots))
+            self._cond = threading.Condition()
+            if shared:
+                self._shm = SharedMemory(create=True, size=slots * slot_bytes)
+                atexit.register(self.close)
+        else:
+            self._shm = SharedMemory(name=name)
+        self.name = self._shm.name if self._shm is not None else None
+        self.buffer = self._shm.buf if self._shm is not None else memoryview(bytearray(slots * slot_bytes))
+
+    def put(self, array, block=True, timeout=None):
+        """
+        Copies array into a free slot and returns it with one reference, or
+        None if it does not fit in a slot or, when not blocking, no slot is free.
+        """
+        array = np.asarray(array)
+        if array.nbytes > self.slot_bytes:
+            return None
+        with self._cond:
+            if not self._free:
+                if not block or not self._cond.wait_for(lambda: self._free, timeout=timeout):
+                    return None
+            index = self._free.pop()
+            self._refs[index] = 1
+        slot = CropSlot(self, index, array.shape, array.dtype)
+        slot.array[...] = array
+        return slot
+
+    def retain(self, index):
+        with self._cond:
+            self._refs[index] += 1
+
+    def release(self, index):
+        with self._cond:
+            self._refs[index] -= 1
+            if self._refs[index] == 0:
+                self._free.append(index)
+                self._cond.notify()
+
+    def locate(self, array):
+        """
+        Returns the spec of an array that already lives inside one of this
+        ring's slots, or None.
+        """
+        if not array.flags['C_CONTIGUOUS']:
+            return None
+        start = np.frombuffer(self.buffer, dtype=np.uint8).ctypes.data
+        address = array.ctypes.data - start
+        if address < 0 or address % self.slot_bytes or address >= len(self.buffer) or array.nbytes > self.slot_bytes:
+            return None
+        return (address, array.shape, array.dtype.str)
+
+    def view(self, spec):
+        offset, shape, dtype = spec
+        return np.ndarray(shape, dtype=dtype, buffer=self.buffer, offset=offset)
+
+    def close(self):
+        shm, self._shm = self._shm, None
+        self.buffer = None
+        if shm is None:
+            return
+        if self.owner:
+            atexit.unregister(self.close)
+            shm.unlink()
+        try:
+            shm.close()
+        except BufferError:
+            # Crops are still viewed somewhere; the mapping goes with them
+            pass
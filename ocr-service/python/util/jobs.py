@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job(object):
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.frames_processed = 0
+        self.total_frames = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    def progress(self, frames_processed, total_frames=None):
+        self.frames_processed = frames_processed
+        if total_frames:
+            self.total_frames = total_frames
+
+    def snapshot(self):
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'frames_processed': self.frames_processed,
+            'total_frames': self.total_frames,
+            'fps': round(self.frames_processed / elapsed, 2) if elapsed > 0 else 0.0,
+            'elapsed': round(elapsed, 2),
+            'created_at': self.created_at,
+            'error': self.error,
+        }
+
+
+class JobManager(object):
+    """
+    Runs long jobs (video processing) on a bounded pool of worker threads so
+    the request that submits them returns immediately. At most `max_pending`
+    jobs may wait for a worker; finished jobs are kept for `retention` seconds.
+    """
+    def __init__(self, max_workers=1, max_pending=8, retention=3600):
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queues fn(*args, progress=job.progress, **kwargs). Its return value
+        becomes the job result.
+        """
+        with self._lock:
+            self._expire()
+            pending = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs already waiting")
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args, progress=job.progress, **kwargs)
+            job.status = 'done'
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+        return job.result
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at and now - job.finished_at > self.retention]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def load_yolo(weights):
+    # ultralytics pulls in torch; importing it here keeps it off the import path
+    from ultralytics import YOLO
+    return YOLO(weights)
+
+
+def load_paddleocr(**kwargs):
+    from paddleocr import PaddleOCR
+    return PaddleOCR(**kwargs)
+
+
+def warmup_yolo(model, size=640):
+    model(np.zeros((size, size, 3), dtype=np.uint8), verbose=False)
+
+
+def warmup_paddleocr(reader):
+    reader.ocr(np.zeros((48, 160, 3), dtype=np.uint8), cls=True)
+
+
+class _Guarded(object):
+    """
+    Thin handle around a loaded model that serializes calls on the model's lock.
+    YOLO predictors and PaddleOCR keep per-instance state between calls, so two
+    gthread workers must never run the same instance at the same time.
+    """
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        with self._registry.borrow(self._name) as instance:
+            return instance(*args, **kwargs)
+
+    def ocr(self, *args, **kwargs):
+        with self._registry.borrow(self._name) as instance:
+            return instance.ocr(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.load(self._name), attr)
+
+
+class ModelRegistry(object):
+    """
+    Process-wide registry that loads every model once per worker and warms it up
+    with a dummy inference before the first real request hits it. Load and
+    warmup times also go to `profile` (a StartupProfile) when one is given.
+    """
+    def __init__(self, profile=None):
+        self.profile = profile
+        self._specs = {}
+        self._instances = {}
+        self._call_locks = {}
+        self._load_locks = {}
+        self._status = {}
+
+    def register(self, name, loader, warmup=None):
+        self._specs[name] = (loader, warmup)
+        self._call_locks[name] = threading.Lock()
+        self._load_locks[name] = threading.Lock()
+        self._status[name] = {'state': 'pending', 'load_time': None, 'warmup_time': None, 'error': None}
+
+    def load(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._load_locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+
+            loader, warmup = self._specs[name]
+            status = self._status[name]
+            status['state'] = 'loading'
+            try:
+                start = time.perf_counter()
+                instance = loader()
+                status['load_time'] = time.perf_counter() - start
+                if self.profile is not None:
+                    self.profile.record(f"load {name}", status['load_time'], start)
+
+                if warmup is not None:
+                    start = time.perf_counter()
+                    warmup(instance)
+                    status['warmup_time'] = time.perf_counter() - start
+                    if self.profile is not None:
+                        self.profile.record(f"warmup {name}", status['warmup_time'], start)
+            except Exception as e:
+                status['state'] = 'error'
+                status['error'] = str(e)
+                logger.error(f"Failed to load model '{name}': {e}")
+                raise
+
+            self._instances[name] = instance
+            status['state'] = 'ready'
+            status['error'] = None
+            logger.info(f"Model '{name}' ready (load {status['load_time']:.2f}s, warmup {status['warmup_time'] or 0:.2f}s)")
+            return instance
+
+    def load_all(self):
+        for name in self._specs:
+            try:
+                self.load(name)
+            except Exception:
+                pass
+
+    def preload(self):
+        """
+        Loads every registered model on a background thread so the worker can
+        answer /health while the weights are still being read.
+        """
+        thread = threading.Thread(target=self.load_all, name='model-preload', daemon=True)
+        thread.start()
+        return thread
+
+    @contextmanager
+    def borrow(self, name):
+        instance = self.load(name)
+        with self._call_locks[name]:
+            yield instance
+
+    def get(self, name):
+        return _Guarded(self, name)
+
+    def ready(self):
+        return all(status['state'] == 'ready' for status in self._status.values())
+
+    def status(self):
+        return {name: dict(status) for name, status in self._status.items()}
@@ -0,0 +1,261 @@
+import threading
+
+import cv2
+import numpy as np
+
+# sequential - one full PaddleOCR pass per variant, all variants always read
+# early_exit - same passes, but variants are produced and read lazily so the
+#              caller can stop at the first one that formats into a plate
+# batch      - text detection per variant, then every detected line of every
+#              variant goes through the recognizer as a single batch
+OCR_MODES = ('sequential', 'early_exit', 'batch')
+
+
+def plate_variants(plate_img, enhance):
+    """
+    Yields the preprocessed versions of a plate crop in the order read_plate
+    has always tried them. Built lazily so early exit skips the costly ones.
+    """
+    yield plate_img
+    yield enhance(plate_img)
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+    yield gray
+    yield cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+
+def to_ocr_input(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if len(img.shape) == 3 else img
+
+
+def to_rec_input(img):
+    # The recognizer only accepts 3 channel images when fed a list directly
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if len(img.shape) == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+
+
+def combine_lines(lines):
+    """
+    Joins (top_y, text) pairs top to bottom, keeping only lines longer than the
+    text gathered so far, same as the original per-variant loop.
+    """
+    combined_text = ''
+    for _, text in sorted(lines, key=lambda line: line[0]):
+        if len(text) > len(combined_text):
+            combined_text += text
+    return combined_text
+
+
+def ocr_single(reader, img):
+    results = reader.ocr(to_ocr_input(img), cls=True)
+    if results and results[0]:
+        return combine_lines([(result[0][0][1], result[1][0]) for result in results[0]])
+    return None
+
+
+def rec_results(results, count):
+    """
+    One (text, score) per image of a det=False call on a list of images.
+    PaddleOCR returns one result list per input image, empty or None when
+    nothing was read. Any other number of results cannot be matched back to
+    the images and raises ValueError rather than misattribute a reading.
+    """
+    if not results:
+        return [('', 0.0)] * count
+    if len(results) != count:
+        raise ValueError(f"OCR returned {len(results)} results for {count} images")
+    return [tuple(result[0]) if result else ('', 0.0) for result in results]
+
+
+def recognize(reader, images, rgb=True):
+    """
+    Runs only the text recognizer over already-cropped images, skipping text
+    detection and the angle classifier. Returns one (text, score) per image.
+    """
+    if not images:
+        return []
+    if rgb:
+        images = [to_rec_input(img) for img in images]
+    else:
+        images = [img if len(img.shape) == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) for img in images]
+    return rec_results(reader.ocr(images, det=False, cls=False), len(images))
+
+
+def rec_single(reader, img):
+    text, _ = recognize(reader, [img])[0]
+    return text or None
+
+
+def rec_batch(reader, variants):
+    return [text or None for text, _ in recognize(reader, variants)]
+
+
+def ocr_batch(reader, variants):
+    crops = []
+    owners = []
+    tops = []
+    for i, img in enumerate(variants):
+        img_data = to_rec_input(img)
+        boxes = reader.ocr(img_data, rec=False)
+        if not boxes or not boxes[0]:
+            continue
+        for box in boxes[0]:
+            points = np.array(box)
+            x1, y1 = np.floor(points.min(axis=0)).astype(int)
+            x2, y2 = np.ceil(points.max(axis=0)).astype(int)
+            crop = img_data[max(0, y1):y2, max(0, x1):x2]
+            if crop.size > 0:
+                crops.append(crop)
+                owners.append(i)
+                tops.append(box[0][1])
+
+    texts = [None] * len(variants)
+    if not crops:
+        return texts
+
+    results = reader.ocr(crops, det=False, cls=True)
+    lines = [[] for _ in variants]
+    for owner, top, (text, _) in zip(owners, tops, rec_results(results, len(crops))):
+        lines[owner].append((top, text))
+    for i, variant_lines in enumerate(lines):
+        if variant_lines:
+            texts[i] = combine_lines(variant_lines)
+    return texts
+
+
+def variant_texts(reader, images, mode='sequential', rec_only=False):
+    """
+    One text or None per image, read the way `mode` reads variants: batch
+    puts every detected line of every image through one recognizer call, the
+    other modes read the images one by one.
+    """
+    if mode not in OCR_MODES:
+        raise ValueError(f"Unknown OCR mode: {mode}")
+    if mode == 'batch':
+        return (rec_batch if rec_only else ocr_batch)(reader, list(images))
+    single = rec_single if rec_only else ocr_single
+    return [single(reader, img) for img in images]
+
+
+def iter_plate_texts(reader, variants, mode='early_exit', rec_only=False):
+    """
+    Yields the OCR text of every variant that produced one, in variant order.
+    With rec_only the variants are treated as tight plate crops and go straight
+    to the recognizer.
+    """
+    if mode not in OCR_MODES:
+        raise ValueError(f"Unknown OCR mode: {mode}")
+
+    if mode == 'early_exit':
+        single = rec_single if rec_only else ocr_single
+        texts = (single(reader, img) for img in variants)
+    else:
+        texts = variant_texts(reader, variants, mode=mode, rec_only=rec_only)
+
+    for text in texts:
+        if text is not None:
+            yield text
+
+
+def batch_plate_texts(reader, crops, enhance, accept, rec_only=False, read=None, mode='early_exit'):
+    """
+    Reads several crops with the outcome of iter_plate_texts in `mode` on
+    each. In early_exit mode round k reads variant k of every crop still
+    unresolved in a single call, and a crop drops out as soon as accept(text)
+    returns a value; the other modes read every variant of every crop in one
+    call. read(images), one text or None per image, replaces the reader call
+    (e.g. OCRProcessPool.variant_texts). Returns (accepted, last_text) per
+    crop, either may be None.
+    """
+    if mode not in OCR_MODES:
+        raise ValueError(f"Unknown OCR mode: {mode}")
+    if read is None:
+        read_mode = 'sequential' if mode == 'sequential' else 'batch'
+        read = lambda images: variant_texts(reader, images, mode=read_mode, rec_only=rec_only)
+    accepted = [None] * len(crops)
+    last_text = [None] * len(crops)
+
+    if mode != 'early_exit':
+        variants = [list(plate_variants(crop, enhance)) for crop in crops]
+        texts = iter(read([img for crop_variants in variants for img in crop_variants]))
+        for i, crop_variants in enumerate(variants):
+            for text in [next(texts) for _ in crop_variants]:
+                if text is not None:
+                    last_text[i] = text
+                    accepted[i] = accept(text) or None
+                    if accepted[i] is not None:
+                        break
+        return list(zip(accepted, last_text))
+
+    variants = [plate_variants(crop, enhance) for crop in crops]
+    pending = list(range(len(crops)))
+    while pending:
+        owners = []
+        images = []
+        for i in pending:
+            img = next(variants[i], None)
+            if img is not None:
+                owners.append(i)
+                images.append(img)
+        if not images:
+            break
+
+        texts = read(images)
+        pending = []
+        for i, text in zip(owners, texts):
+            if text is not None:
+                last_text[i] = text
+                accepted[i] = accept(text) or None
+            if accepted[i] is None:
+                pending.append(i)
+
+    return list(zip(accepted, last_text))
+
+
+def plate_quality(plate_img, conf):
+    """
+    Cheap score for how readable a plate crop is likely to be: detector
+    confidence weighted by crop size and Laplacian sharpness.
+    """
+    rows, cols = plate_img.shape[:2]
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if len(plate_img.shape) == 3 else plate_img
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(conf) * float(np.sqrt(rows * cols)) * float(np.log1p(sharpness))
+
+
+class PlateOCRScheduler(object):
+    """
+    Decides which plate crops of a video are worth an OCR call. Each track gets
+    at most `max_reads` reads, each one only on a crop whose quality beats the
+    best crop already read by `min_gain`, and no more reads once a confident
+    reading passes `validate`.
+    """
+    def __init__(self, max_reads=3, min_gain=1.2, accept_score=0.9, validate=None):
+        self.max_reads = max_reads
+        self.min_gain = min_gain
+        self.accept_score = accept_score
+        self.validate = validate
+        self.candidates = 0
+        self.reads = 0
+        self._tracks = {}
+        self._lock = threading.Lock()
+
+    def should_read(self, track_id, quality):
+        """
+        Reads scheduled but not yet recorded count against the budget, so the
+        decision is safe when OCR results arrive on another thread.
+        """
+        with self._lock:
+            self.candidates += 1
+            track = self._tracks.setdefault(track_id, {'reads': 0, 'best_quality': 0.0, 'done': False})
+            if track['done'] or track['reads'] >= self.max_reads:
+                return False
+            if track['reads'] and quality < track['best_quality'] * self.min_gain:
+                return False
+            track['reads'] += 1
+            track['best_quality'] = max(track['best_quality'], quality)
+            self.reads += 1
+            return True
+
+    def record(self, track_id, text, score):
+        with self._lock:
+            if text and score >= self.accept_score and (self.validate is None or self.validate(text)):
+                self._tracks[track_id]['done'] = True
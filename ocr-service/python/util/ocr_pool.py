@@ -0,0 +1,158 @@
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from util.crop_ring import CropRing, CropSlot
+from util.ocr import iter_plate_texts, recognize, variant_texts
+
+_reader = None
+_ring = None
+
+
+def _init_worker(ocr_kwargs, ring_name):
+    global _reader, _ring
+    from paddleocr import PaddleOCR
+    _reader = PaddleOCR(**ocr_kwargs)
+    _ring = CropRing(name=ring_name)
+
+
+def _attach(specs):
+    """
+    Ring crops are read in place; crops that did not fit in a slot come in
+    their own block and are copied out so the block can be closed.
+    """
+    images = []
+    for name, spec in specs:
+        if name is None:
+            images.append(_ring.view(spec))
+            continue
+        _, shape, dtype = spec
+        shm = SharedMemory(name=name)
+        try:
+            images.append(np.array(np.ndarray(shape, dtype=dtype, buffer=shm.buf)))
+        finally:
+            shm.close()
+    return images
+
+
+def _plate_texts(specs, mode, rec_only):
+    return list(iter_plate_texts(_reader, _attach(specs), mode=mode, rec_only=rec_only))
+
+
+def _variant_texts(specs, mode, rec_only):
+    return variant_texts(_reader, _attach(specs), mode=mode, rec_only=rec_only)
+
+
+def _readings(specs, rec_only):
+    images = _attach(specs)
+    if rec_only:
+        return [(text, score) for text, score in recognize(_reader, images, rgb=False) if text]
+
+    readings = []
+    for img in images:
+        result = _reader.ocr(img, cls=True)
+        if result[0]:
+            readings.extend([(line[1][0], line[1][1]) for line in result[0]])
+    return readings
+
+
+class OCRProcessPool(object):
+    """
+    Pool of worker processes, each holding its own PaddleOCR instance, so OCR
+    pre/post-processing runs outside the web worker's GIL. Crops are handed
+    over through the pool's CropRing instead of being pickled; workers send
+    back only texts and scores. Images that already sit in a ring slot (e.g.
+    CropSlot.array) are passed by reference without any copy.
+    """
+    def __init__(self, processes, ocr_kwargs=None, ring_slots=64, slot_bytes=256 * 1024):
+        self.processes = processes
+        self.ring = CropRing(slots=ring_slots, slot_bytes=slot_bytes)
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(ocr_kwargs or {'use_angle_cls': True, 'lang': 'en'}, self.ring.name),
+        )
+        atexit.register(self.shutdown)
+
+    def _share(self, images):
+        held = []
+        specs = []
+        for img in images:
+            if isinstance(img, CropSlot):
+                img = img.array
+            img = np.ascontiguousarray(img)
+            spec = self.ring.locate(img)
+            if spec is None:
+                # Never block here: the caller may itself be holding slots
+                slot = self.ring.put(img, block=False)
+                if slot is not None:
+                    held.append(slot)
+                    spec = slot.spec
+            if spec is not None:
+                specs.append((None, spec))
+                continue
+            shm = SharedMemory(create=True, size=max(1, img.nbytes))
+            np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[:] = img
+            held.append(shm)
+            specs.append((shm.name, (0, img.shape, img.dtype.str)))
+        return held, specs
+
+    def _submit(self, fn, images, *args):
+        held, specs = self._share(images)
+        try:
+            future = self._executor.submit(fn, specs, *args)
+        except Exception:
+            self._free(held)
+            raise
+        future.add_done_callback(lambda _: self._free(held))
+        return future
+
+    def _free(self, held):
+        for item in held:
+            if isinstance(item, CropSlot):
+                item.release()
+            else:
+                item.close()
+                item.unlink()
+
+    def _call(self, fn, images, *args):
+        return self._submit(fn, images, *args).result()
+
+    def plate_texts(self, variants, mode='early_exit', rec_only=False):
+        """
+        Same contract as util.ocr.iter_plate_texts. In early_exit mode each
+        variant is sent on its own, so the caller can stop between them.
+        """
+        if mode == 'early_exit':
+            for img in variants:
+                yield from self._call(_plate_texts, [img], 'sequential', rec_only)
+        else:
+            yield from self._call(_plate_texts, list(variants), mode, rec_only)
+
+    def variant_texts(self, images, rec_only=False, mode='sequential'):
+        """
+        The text of each image, or None, read as util.ocr.variant_texts does.
+        In batch mode the images go to one worker as one task; otherwise every
+        image is submitted as its own task before any result is collected, so
+        one call is spread across all worker processes.
+        """
+        if mode == 'batch':
+            return self._call(_variant_texts, list(images), mode, rec_only)
+        futures = [self._submit(_variant_texts, [img], 'sequential', rec_only) for img in images]
+        return [future.result()[0] for future in futures]
+
+    def readings(self, images, rec_only=False):
+        return self._call(_readings, images, rec_only)
+
+    def shutdown(self):
+        """
+        Stops the workers and unlinks the ring. Safe to call more than once; it
+        also runs at interpreter exit.
+        """
+        atexit.unregister(self.shutdown)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.ring.close()
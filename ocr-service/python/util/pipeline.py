@@ -0,0 +1,84 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class Pipe(object):
+    """
+    Bounded queue between two pipeline stages. put() blocks while the queue is
+    full, which is what keeps the number of in-flight frames capped, and both
+    ends give up as soon as any stage of the pipeline has failed.
+    """
+    def __init__(self, maxsize, stop):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = stop
+
+    def put(self, item):
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def close(self):
+        self.put(_DONE)
+
+    def __iter__(self):
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+
+class Pipeline(object):
+    """
+    Runs the stages of a streaming job on their own threads, connected by
+    bounded Pipes. The first exception raised by any stage stops the others and
+    is re-raised by join().
+    """
+    def __init__(self):
+        self.stop = threading.Event()
+        self._threads = []
+        self._errors = []
+
+    def pipe(self, maxsize):
+        return Pipe(maxsize, self.stop)
+
+    def spawn(self, name, target, *args):
+        thread = threading.Thread(target=self.run, args=(target,) + args, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return thread
+
+    def run(self, target, *args):
+        try:
+            target(*args)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            logger.error(f"Pipeline stage {threading.current_thread().name} failed: {str(e)}")
+            self._errors.append(e)
+            self.stop.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
@@ -0,0 +1,118 @@
+import re
+import string
+from difflib import get_close_matches
+
+# Characters OCR confuses between the letter and digit sections of a plate
+CONFUSIONS = {
+    'O': '0',
+    'I': '1',
+    'Z': '2',
+    'J': '3',
+    'A': '4',
+    'S': '5',
+    'G': '6',
+    'T': '7',
+    'B': '8',
+}
+TO_ALPHA = str.maketrans({digit: letter for letter, digit in CONFUSIONS.items()})
+TO_DIGIT = str.maketrans(CONFUSIONS)
+
+_NOISE = re.compile(r'[^A-Z0-9]+')
+# A formatted plate: region, number and suffix
+PLATE_FORMAT = re.compile(r'^[A-Z]{1,2}\s*\d{1,4}\s*[A-Z]{1,3}$')
+
+
+def clean_plate_text(text):
+    return _NOISE.sub('', text.upper())
+
+
+def tokenize(text):
+    """
+    One pass over a cleaned plate string. Returns the (start, stop) of its
+    first digit run, capped at four digits, or None, and the alternating
+    letter and digit runs of the whole string.
+    """
+    runs = []
+    first_number = None
+    start = 0
+    for i in range(1, len(text) + 1):
+        if i == len(text) or text[i].isdigit() != text[start].isdigit():
+            if first_number is None and text[start].isdigit():
+                first_number = (start, min(i, start + 4))
+            runs.append(text[start:i])
+            start = i
+    return first_number, runs
+
+
+class PlateNormalizer(object):
+    """
+    Splits OCR text into an Indonesian plate's region prefix, number and
+    suffix. The nearest region code of every one and two letter prefix is
+    worked out once up front, so normalizing a reading is a single pass over
+    the text plus table lookups.
+    """
+    def __init__(self, region_codes, cutoff=0.6):
+        self.region_codes = region_codes
+        self.cutoff = cutoff
+        self._nearest = {}
+        letters = string.ascii_uppercase
+        for first in letters:
+            for prefix in [first] + [first + second for second in letters]:
+                self._nearest[prefix] = self._closest(prefix)
+
+    def _closest(self, code):
+        if code in self.region_codes:
+            return code
+        matches = get_close_matches(code, self.region_codes.keys(), n=1, cutoff=self.cutoff)
+        return matches[0] if matches else None
+
+    def region(self, code):
+        """
+        The region code itself, else the closest one, else None.
+        """
+        if code in self._nearest:
+            return self._nearest[code]
+        return self._closest(code)
+
+    def split(self, text, strict=False):
+        """
+        Returns (region, numbers, suffix) or None. The text is split around its
+        first run of up to four digits; letters in the number and digits in the
+        prefix or suffix are swapped through the confusion table.
+
+        By default over-long sections are truncated to 2/4/3 characters and,
+        if that split fails, the letter/digit runs are tried as prefix, number
+        and suffix. With strict, over-long sections reject the reading instead
+        and there is no second attempt.
+        """
+        text = clean_plate_text(text)
+        first_number, runs = tokenize(text)
+
+        if first_number is not None:
+            start, stop = first_number
+            prefix = text[:start].translate(TO_ALPHA)
+            numbers = text[start:stop].translate(TO_DIGIT)
+            suffix = text[stop:].translate(TO_ALPHA)
+
+            if strict:
+                if len(prefix) <= 2 and len(numbers) <= 4 and len(suffix) <= 3:
+                    region = self.region(prefix)
+                    if region:
+                        return region, numbers, suffix
+                return None
+
+            result = self._accept(prefix[:2], numbers[:4], suffix[:3])
+            if result:
+                return result
+
+        if not strict and len(runs) >= 3:
+            return self._accept(runs[0].translate(TO_ALPHA)[:2], runs[1].translate(TO_DIGIT)[:4],
+                                ''.join(runs[2:]).translate(TO_ALPHA)[:3])
+        return None
+
+    def _accept(self, prefix, numbers, suffix):
+        if prefix and numbers:
+            region = self.region(prefix)
+            if region:
+                return region, numbers, suffix
+        return None
@@ -19,16 +19,10 @@ from __future__ import print_function
 
 import os
 import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from skimage import io
 
 import glob
 import time
 import argparse
-from filterpy.kalman import KalmanFilter
 
 np.random.seed(0)
 
@@ -96,10 +90,14 @@ class KalmanBoxTracker(object):
   This class represents the internal state of individual tracked objects observed as bbox.
   """
   count = 0
-  def __init__(self,bbox):
+  def __init__(self,bbox,track_id=None):
     """
-    Initialises a tracker using initial bounding box.
+    Initialises a tracker using initial bounding box. Without track_id the id
+    comes from the class-wide KalmanBoxTracker.count.
     """
+    # filterpy pulls in scipy.stats; VectorSort does without it
+    from filterpy.kalman import KalmanFilter
+
     #define constant velocity model
     self.kf = KalmanFilter(dim_x=7, dim_z=4) 
     self.kf.F = np.array([[1,0,0,0,1,0,0],[0,1,0,0,0,1,0],[0,0,1,0,0,0,1],[0,0,0,1,0,0,0],  [0,0,0,0,1,0,0],[0,0,0,0,0,1,0],[0,0,0,0,0,0,1]])
@@ -113,8 +111,10 @@ class KalmanBoxTracker(object):
 
     self.kf.x[:4] = convert_bbox_to_z(bbox)
     self.time_since_update = 0
-    self.id = KalmanBoxTracker.count
-    KalmanBoxTracker.count += 1
+    if track_id is None:
+      track_id = KalmanBoxTracker.count
+      KalmanBoxTracker.count += 1
+    self.id = track_id
     self.history = []
     self.hits = 0
     self.hit_streak = 0
@@ -151,61 +151,157 @@ class KalmanBoxTracker(object):
     return convert_x_to_bbox(self.kf.x)
 
 
-def associate_detections_to_trackers(detections,trackers,iou_threshold = 0.3):
+def iou_pairs(bb_test, bb_gt):
+  """
+  Sparse counterpart of iou_batch: returns (i, j, iou) for every pair of an
+  overlapping bb_test[i] and bb_gt[j]. bb_gt is sorted by x1 once, and each
+  test box only looks at the slice that can reach it horizontally: boxes that
+  start left of its right edge and, being at most the widest box wide, end
+  right of its left edge.
+  """
+  order = np.argsort(bb_gt[:, 0], kind='stable')
+  x1 = bb_gt[order, 0]
+  widest = np.max(bb_gt[:, 2] - bb_gt[:, 0])
+  lo = np.searchsorted(x1, bb_test[:, 0] - widest, side='right')
+  hi = np.searchsorted(x1, bb_test[:, 2], side='left')
+  counts = np.maximum(hi - lo, 0)
+  total = counts.sum()
+
+  i = np.repeat(np.arange(len(bb_test)), counts)
+  j = order[np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(total)]
+  test = bb_test[i]
+  gt = bb_gt[j]
+  w = np.maximum(0., np.minimum(test[:, 2], gt[:, 2]) - np.maximum(test[:, 0], gt[:, 0]))
+  h = np.maximum(0., np.minimum(test[:, 3], gt[:, 3]) - np.maximum(test[:, 1], gt[:, 1]))
+  wh = w * h
+  with np.errstate(invalid='ignore', divide='ignore'):
+    o = wh / ((test[:, 2] - test[:, 0]) * (test[:, 3] - test[:, 1])
+      + (gt[:, 2] - gt[:, 0]) * (gt[:, 3] - gt[:, 1]) - wh)
+  keep = o > 0
+  return i[keep], j[keep], o[keep]
+
+
+def _assign_block(i, j, iou):
+  rows, r = np.unique(i, return_inverse=True)
+  cols, c = np.unique(j, return_inverse=True)
+  cost = np.zeros((len(rows), len(cols)))
+  cost[r, c] = -iou
+  m = linear_assignment(cost).reshape(-1, 2).astype(int)
+  return np.stack([rows[m[:, 0]], cols[m[:, 1]]], axis=1), -cost[m[:, 0], m[:, 1]]
+
+
+def sparse_assignment(i, j, iou, n_rows, n_cols, max_block=250000):
+  """
+  Maximum-IoU assignment over the sparse pairs (i, j, iou). A pair whose boxes
+  overlap nothing else is matched directly. The contested pairs left over go
+  to linear_assignment as one dense block over just their rows and columns,
+  or, when that block would exceed max_block cells, one block per connected
+  component of the overlap graph, since boxes that share no overlap never
+  compete. Returns the (k,2) [row, col] matches sorted by row and their IoU,
+  which is 0 where the solver paired boxes that do not overlap.
+  """
+  single = (np.bincount(i, minlength=n_rows)[i] == 1) & (np.bincount(j, minlength=n_cols)[j] == 1)
+  matches = [np.stack([i[single], j[single]], axis=1)]
+  match_iou = [iou[single]]
+
+  shared = np.flatnonzero(~single)
+  if len(shared) and len(np.unique(i[shared])) * len(np.unique(j[shared])) <= max_block:
+    groups = [shared]
+  elif len(shared):
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    graph = coo_matrix((np.ones(len(shared)), (i[shared], n_rows + j[shared])),
+                       shape=(n_rows + n_cols, n_rows + n_cols))
+    _, labels = connected_components(graph, directed=False)
+    component = labels[i[shared]]
+    shared = shared[np.argsort(component, kind='stable')]
+    groups = np.split(shared, np.flatnonzero(np.diff(np.sort(component))) + 1)
+  else:
+    groups = []
+
+  for group in groups:
+    block_matches, block_iou = _assign_block(i[group], j[group], iou[group])
+    matches.append(block_matches)
+    match_iou.append(block_iou)
+
+  matches = np.concatenate(matches).astype(int)
+  order = np.argsort(matches[:, 0], kind='stable')
+  return matches[order], np.concatenate(match_iou)[order]
+
+
+def associate_detections_to_trackers(detections,trackers,iou_threshold = 0.3,gated = True):
   """
   Assigns detections to tracked object (both represented as bounding boxes)
 
+  With gated (the default) only overlapping pairs are scored, through
+  iou_pairs and sparse_assignment; otherwise the full IoU matrix is solved in
+  one linear_assignment. When every detection and tracker has at most one
+  partner above the threshold those pairs are taken without an assignment.
+
   Returns 3 lists of matches, unmatched_detections and unmatched_trackers
   """
   if(len(trackers)==0):
     return np.empty((0,2),dtype=int), np.arange(len(detections)), np.empty((0,5),dtype=int)
 
-  iou_matrix = iou_batch(detections, trackers)
-
-  if min(iou_matrix.shape) > 0:
-    a = (iou_matrix > iou_threshold).astype(np.int32)
-    if a.sum(1).max() == 1 and a.sum(0).max() == 1:
-        matched_indices = np.stack(np.where(a), axis=1)
-    else:
-      matched_indices = linear_assignment(-iou_matrix)
+  if len(detections) == 0:
+    i, j, iou = np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+  elif gated:
+    i, j, iou = iou_pairs(detections, trackers)
   else:
-    matched_indices = np.empty(shape=(0,2))
-
-  unmatched_detections = []
-  for d, det in enumerate(detections):
-    if(d not in matched_indices[:,0]):
-      unmatched_detections.append(d)
-  unmatched_trackers = []
-  for t, trk in enumerate(trackers):
-    if(t not in matched_indices[:,1]):
-      unmatched_trackers.append(t)
-
-  #filter out matched with low IOU
-  matches = []
-  for m in matched_indices:
-    if(iou_matrix[m[0], m[1]]<iou_threshold):
-      unmatched_detections.append(m[0])
-      unmatched_trackers.append(m[1])
-    else:
-      matches.append(m.reshape(1,2))
-  if(len(matches)==0):
+    # Zero-area boxes give 0/0; count them as not overlapping, as iou_pairs does
+    with np.errstate(invalid='ignore', divide='ignore'):
+      iou_matrix = np.nan_to_num(iou_batch(detections, trackers))
+    i, j = np.nonzero(iou_matrix > 0)
+    iou = iou_matrix[i, j]
+
+  above = iou > iou_threshold
+  if above.any() and np.bincount(i[above]).max() == 1 and np.bincount(j[above]).max() == 1:
+    matches = np.stack([i[above], j[above]], axis=1)
+    match_iou = iou[above]
+  elif len(iou) == 0:
     matches = np.empty((0,2),dtype=int)
+    match_iou = np.empty(0)
+  elif gated:
+    matches, match_iou = sparse_assignment(i, j, iou, len(detections), len(trackers))
   else:
-    matches = np.concatenate(matches,axis=0)
+    matches = linear_assignment(-iou_matrix).reshape(-1, 2).astype(int)
+    match_iou = iou_matrix[matches[:, 0], matches[:, 1]]
+
+  #filter out matched with low IOU
+  matches = matches[match_iou >= iou_threshold].astype(int)
 
-  return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+  matched_detections = np.zeros(len(detections), dtype=bool)
+  matched_detections[matches[:, 0]] = True
+  matched_trackers = np.zeros(len(trackers), dtype=bool)
+  matched_trackers[matches[:, 1]] = True
+  return matches, np.flatnonzero(~matched_detections), np.flatnonzero(~matched_trackers)
 
 
 class Sort(object):
   def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
     """
-    Sets key parameters for SORT
+    Sets key parameters for SORT. Track ids are counted per instance, so
+    trackers running side by side (one per video job) number their tracks
+    independently and never share the class-wide KalmanBoxTracker.count.
     """
     self.max_age = max_age
     self.min_hits = min_hits
     self.iou_threshold = iou_threshold
     self.trackers = []
     self.frame_count = 0
+    self.next_id = 0
+
+  def advance(self):
+    """
+    Moves every track's Kalman state one frame forward without counting it as a
+    missed detection. Call it for frames the detector skips so the constant
+    velocity model keeps working in real frame units.
+    """
+    for trk in self.trackers:
+      if((trk.kf.x[6]+trk.kf.x[2])<=0):
+        trk.kf.x[6] *= 0.0
+      trk.kf.predict()
 
   def update(self, dets=np.empty((0, 5))):
     """
@@ -237,7 +333,8 @@ class Sort(object):
 
     # create and initialise new trackers for unmatched detections
     for i in unmatched_dets:
-        trk = KalmanBoxTracker(dets[i,:])
+        trk = KalmanBoxTracker(dets[i,:], track_id=self.next_id)
+        self.next_id += 1
         self.trackers.append(trk)
     i = len(self.trackers)
     for trk in reversed(self.trackers):
@@ -252,6 +349,234 @@ class Sort(object):
       return np.concatenate(ret)
     return np.empty((0,5))
 
+# Constant velocity model shared by every track of a VectorSort, with the same
+# noise settings KalmanBoxTracker applies on top of the filterpy defaults
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.
+_H = np.eye(4, 7)
+_R = np.eye(4)
+_R[2:,2:] *= 10.
+_P0 = np.eye(7)
+_P0[4:,4:] *= 1000.
+_P0 *= 10.
+_Q = np.eye(7)
+_Q[-1,-1] *= 0.01
+_Q[4:,4:] *= 0.01
+
+
+def convert_bboxes_to_z(bboxes):
+  """
+  Row-wise convert_bbox_to_z: (N,4+) boxes [x1,y1,x2,y2,...] to (N,4) [x,y,s,r]
+  """
+  w = bboxes[:, 2] - bboxes[:, 0]
+  h = bboxes[:, 3] - bboxes[:, 1]
+  return np.stack([bboxes[:, 0] + w/2., bboxes[:, 1] + h/2., w * h, w / h], axis=1)
+
+
+def convert_xs_to_bboxes(xs):
+  """
+  Row-wise convert_x_to_bbox: (N,7+) states to (N,4) boxes [x1,y1,x2,y2]
+  """
+  w = np.sqrt(xs[:, 2] * xs[:, 3])
+  h = xs[:, 2] / w
+  return np.stack([xs[:, 0] - w/2., xs[:, 1] - h/2., xs[:, 0] + w/2., xs[:, 1] + h/2.], axis=1)
+
+
+def predict_states(x, P):
+  """
+  Kalman predict of stacked (N,7) states and (N,7,7) covariances.
+  """
+  # A negative predicted area would make the box NaN; stop the scale velocity
+  x = x.copy()
+  x[x[:, 6] + x[:, 2] <= 0, 6] = 0.
+  return x @ _F.T, _F @ P @ _F.T + _Q
+
+
+def predict_all(trackers):
+  """
+  Runs the Kalman predict of several VectorSorts as one stacked operation and
+  hands each tracker back its own rows. Follow it with correct(dets), or
+  nothing for a frame without detector output, on each tracker.
+  """
+  if not trackers:
+    return
+  sizes = np.cumsum([len(tracker) for tracker in trackers])[:-1]
+  x, P = predict_states(np.concatenate([tracker.x for tracker in trackers]),
+                        np.concatenate([tracker.P for tracker in trackers]))
+  for tracker, tracker_x, tracker_P in zip(trackers, np.split(x, sizes), np.split(P, sizes)):
+    tracker.x, tracker.P = tracker_x, tracker_P
+
+
+class VectorSort(object):
+  """
+  Struct-of-arrays SORT. Every track's state and covariance live in stacked
+  arrays (x is (N,7), P is (N,7,7)) and the Kalman predict and update run for
+  all tracks at once instead of through one filterpy KalmanFilter per track.
+  The filter, association and track life cycle are those of Sort, and update()
+  returns the same [x1,y1,x2,y2,id] rows in the same order, ids included, as
+  both count track ids per instance.
+  """
+  def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+    self.max_age = max_age
+    self.min_hits = min_hits
+    self.iou_threshold = iou_threshold
+    self.frame_count = 0
+    self.next_id = 0
+    self.x = np.zeros((0, 7))
+    self.P = np.zeros((0, 7, 7))
+    self.ids = np.zeros(0, dtype=np.int64)
+    self.time_since_update = np.zeros(0, dtype=np.int64)
+    self.hits = np.zeros(0, dtype=np.int64)
+    self.hit_streak = np.zeros(0, dtype=np.int64)
+    self.age = np.zeros(0, dtype=np.int64)
+
+  @property
+  def trackers(self):
+    """
+    Ids of the live tracks; stands in for Sort.trackers where only its length
+    is used.
+    """
+    return self.ids
+
+  def __len__(self):
+    return len(self.ids)
+
+  def _keep(self, mask):
+    self.x = self.x[mask]
+    self.P = self.P[mask]
+    self.ids = self.ids[mask]
+    self.time_since_update = self.time_since_update[mask]
+    self.hits = self.hits[mask]
+    self.hit_streak = self.hit_streak[mask]
+    self.age = self.age[mask]
+
+  def _predict(self):
+    self.x, self.P = predict_states(self.x, self.P)
+
+  def _update(self, index, z):
+    """
+    Kalman update of the tracks at `index` with (M,4) measurements z, in the
+    Joseph form filterpy uses.
+    """
+    x = self.x[index]
+    P = self.P[index]
+    y = z - x[:, :4]
+    PHT = P[:, :, :4]
+    S = PHT[:, :4, :] + _R
+    K = PHT @ np.linalg.inv(S)
+    self.x[index] = x + (K @ y[:, :, None])[:, :, 0]
+    I_KH = np.eye(7) - K @ _H
+    self.P[index] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ _R @ K.transpose(0, 2, 1)
+
+  def _spawn(self, dets):
+    n = len(dets)
+    x = np.zeros((n, 7))
+    x[:, :4] = convert_bboxes_to_z(dets)
+    self.x = np.concatenate([self.x, x])
+    self.P = np.concatenate([self.P, np.broadcast_to(_P0, (n, 7, 7))])
+    self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+    self.next_id += n
+    zeros = np.zeros(n, dtype=np.int64)
+    self.time_since_update = np.concatenate([self.time_since_update, zeros])
+    self.hits = np.concatenate([self.hits, zeros])
+    self.hit_streak = np.concatenate([self.hit_streak, zeros])
+    self.age = np.concatenate([self.age, zeros])
+
+  def advance(self):
+    """
+    Moves every track's Kalman state one frame forward without counting it as a
+    missed detection, like Sort.advance.
+    """
+    self._predict()
+
+  def update(self, dets=np.empty((0, 5))):
+    """
+    Same contract as Sort.update: call once per frame with an (N,5) array of
+    [x1,y1,x2,y2,score] detections, possibly empty, and get back the confirmed
+    tracks as [x1,y1,x2,y2,id] rows.
+    """
+    self._predict()
+    return self.correct(dets)
+
+  def correct(self, dets=np.empty((0, 5))):
+    """
+    The part of update() after the Kalman predict, for callers that predicted
+    several trackers together through predict_all.
+    """
+    self.frame_count += 1
+    dets = np.asarray(dets, dtype=float).reshape(-1, 5)
+
+    self.age += 1
+    self.hit_streak[self.time_since_update > 0] = 0
+    self.time_since_update += 1
+
+    trks = convert_xs_to_bboxes(self.x)
+    valid = np.isfinite(trks).all(axis=1)
+    if not valid.all():
+      self._keep(valid)
+      trks = trks[valid]
+    matched, unmatched_dets, _ = associate_detections_to_trackers(dets, trks, self.iou_threshold)
+
+    if len(matched):
+      index = matched[:, 1].astype(np.int64)
+      self.time_since_update[index] = 0
+      self.hits[index] += 1
+      self.hit_streak[index] += 1
+      self._update(index, convert_bboxes_to_z(dets[matched[:, 0].astype(np.int64)]))
+
+    if len(unmatched_dets):
+      self._spawn(dets[unmatched_dets.astype(np.int64)])
+
+    confirmed = (self.time_since_update < 1) & ((self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits))
+    ret = np.concatenate([convert_xs_to_bboxes(self.x[confirmed]), self.ids[confirmed, None] + 1.], axis=1)[::-1]
+    alive = self.time_since_update <= self.max_age
+    if not alive.all():
+      self._keep(alive)
+    return ret
+
+def synthetic_scene(n, frames, seed=0):
+  """
+  Detections of n vehicles drifting across a camera view that grows with n so
+  the density stays parking-lot like; about 10% of them are missed per frame.
+  """
+  rng = np.random.default_rng(seed)
+  span = 400. * np.sqrt(n)
+  pos = rng.uniform(0, span, (n, 2))
+  vel = rng.normal(0, 3, (n, 2))
+  size = rng.uniform(40, 160, (n, 2))
+  scene = []
+  for _ in range(frames):
+    pos += vel
+    boxes = np.concatenate([pos, pos + size, rng.uniform(0.5, 1, (n, 1))], axis=1)
+    boxes[:, :4] += rng.normal(0, 2, (n, 4))
+    scene.append(boxes[rng.random(n) > 0.1])
+  return scene
+
+
+def benchmark(counts=(10, 50, 100, 200, 400, 800), frames=50):
+  """
+  Mean milliseconds per frame as the number of vehicles grows: association
+  alone with the dense IoU matrix and with gating, then a whole Sort and
+  VectorSort update.
+  """
+  print('%8s %12s %12s %12s %12s' % ('objects', 'dense', 'gated', 'Sort', 'VectorSort'))
+  for n in counts:
+    scene = synthetic_scene(n, frames)
+    tracks = [dets[:, :4] for dets in scene[:-1]]
+    row = [n]
+    for gated in (False, True):
+      start = time.perf_counter()
+      for dets, trks in zip(scene[1:], tracks):
+        associate_detections_to_trackers(dets, trks, gated=gated)
+      row.append(1000 * (time.perf_counter() - start) / len(tracks))
+    for tracker in (Sort(), VectorSort()):
+      start = time.perf_counter()
+      for dets in scene:
+        tracker.update(dets)
+      row.append(1000 * (time.perf_counter() - start) / len(scene))
+    print('%8d %9.2f ms %9.2f ms %9.2f ms %9.2f ms' % tuple(row))
+
+
 def parse_args():
     """Parse input arguments."""
     parser = argparse.ArgumentParser(description='SORT demo')
@@ -265,18 +590,28 @@ def parse_args():
                         help="Minimum number of associated detections before track is initialised.", 
                         type=int, default=3)
     parser.add_argument("--iou_threshold", help="Minimum IOU for match.", type=float, default=0.3)
+    parser.add_argument('--benchmark', dest='benchmark', help='Time association and tracker updates on synthetic scenes [False]', action='store_true')
     args = parser.parse_args()
     return args
 
 if __name__ == '__main__':
   # all train
   args = parse_args()
+  if(args.benchmark):
+    benchmark()
+    exit()
   display = args.display
   phase = args.phase
   total_time = 0.0
   total_frames = 0
   colours = np.random.rand(32, 3) #used only for display
   if(display):
+    # Display-only dependencies; the tracker itself never needs them
+    import matplotlib
+    matplotlib.use('TkAgg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    from skimage import io
     if not os.path.exists('mot_benchmark'):
       print('\n\tERROR: mot_benchmark link not found!\n\n    Create a symbolic link to the MOT benchmark\n    (https://motchallenge.net/data/2D_MOT_2015/#download). E.g.:\n\n    $ ln -s /path/to/MOT2015_challenge/2DMOT2015 mot_benchmark\n\n')
       exit()
@@ -0,0 +1,49 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile(object):
+    """
+    Wall-clock breakdown of how the service came up: one entry per import
+    group or initialization phase, in the order they ran. Phases deferred to
+    first use (cloud clients, models) are recorded when they finally run, with
+    their offset from process start-up.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, start)
+
+    def record(self, name, seconds, start=None):
+        start = start if start is not None else time.perf_counter() - seconds
+        with self._lock:
+            self.phases.append({
+                'name': name,
+                'ms': round(1000 * seconds, 1),
+                'at_ms': round(1000 * (start - self.started), 1),
+            })
+
+    def report(self):
+        with self._lock:
+            phases = list(self.phases)
+        return {
+            'total_ms': round(sum(phase['ms'] for phase in phases), 1),
+            'phases': phases,
+        }
+
+    def log(self, label='Startup'):
+        report = self.report()
+        breakdown = ', '.join(f"{phase['name']} {phase['ms']}ms" for phase in report['phases'])
+        logger.info(f"{label} took {report['total_ms']}ms: {breakdown}")
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from util.batching import MicroBatcher
+from util.sort import VectorSort, predict_all
+
+logger = logging.getLogger(__name__)
+
+
+class StreamTrackers(object):
+    """
+    One VectorSort per camera stream, each with its own track id space, so a
+    single worker can follow many gate cameras at once. Frames submitted from
+    concurrent request threads are gathered into ticks of at most `max_batch`
+    frames, waiting up to `max_wait` seconds; a tick runs the Kalman predict
+    of every stream in it as one stacked operation, then association and
+    correction per stream. Streams that send nothing for `idle_timeout`
+    seconds are dropped along with their tracks.
+    """
+    def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3, idle_timeout=300.0, max_batch=32,
+                 max_wait=0.005):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.idle_timeout = idle_timeout
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._counts = {'frames': 0, 'ticks': 0, 'created': 0, 'expired': 0}
+        self._batcher = MicroBatcher(self.tick, max_batch=max_batch, max_wait=max_wait,
+                                     name='stream-trackers') if max_batch > 1 else None
+
+    def update(self, stream_id, dets):
+        """
+        Feeds one frame's (N,5) [x1,y1,x2,y2,score] detections of a stream and
+        returns its confirmed tracks as [x1,y1,x2,y2,id] rows, like
+        Sort.update. None stands for a frame the detector skipped: the tracks
+        are only moved forward and nothing is returned.
+        """
+        if self._batcher:
+            return self._batcher.submit((stream_id, dets))
+        return self.tick([(stream_id, dets)])[0]
+
+    def tick(self, frames):
+        """
+        Runs a list of (stream_id, dets) frames and returns one result per
+        frame, in order. Several frames of the same stream are applied one per
+        round, in the order given.
+        """
+        results = [None] * len(frames)
+        with self._lock:
+            now = time.monotonic()
+            pending = [(index, stream_id, dets) for index, (stream_id, dets) in enumerate(frames)]
+            while pending:
+                current, later, seen = [], [], set()
+                for frame in pending:
+                    (later if frame[1] in seen else current).append(frame)
+                    seen.add(frame[1])
+
+                trackers = [self._tracker(stream_id, now) for _, stream_id, _ in current]
+                predict_all(trackers)
+                for (index, _, dets), tracker in zip(current, trackers):
+                    results[index] = np.empty((0, 5)) if dets is None else tracker.correct(dets)
+
+                self._counts['ticks'] += 1
+                pending = later
+
+            self._counts['frames'] += len(frames)
+            self._expire(now)
+        return results
+
+    def _tracker(self, stream_id, now):
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            stream = self._streams[stream_id] = [VectorSort(max_age=self.max_age, min_hits=self.min_hits,
+                                                            iou_threshold=self.iou_threshold), now]
+            self._counts['created'] += 1
+        stream[1] = now
+        return stream[0]
+
+    def _expire(self, now):
+        idle = [stream_id for stream_id, (_, last_seen) in self._streams.items()
+                if now - last_seen > self.idle_timeout]
+        for stream_id in idle:
+            del self._streams[stream_id]
+            logger.info(f"Dropped tracker of idle stream {stream_id}")
+        self._counts['expired'] += len(idle)
+
+    def drop(self, stream_id):
+        with self._lock:
+            return self._streams.pop(stream_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            counts['streams'] = len(self._streams)
+            counts['tracks'] = sum(len(tracker) for tracker, _ in self._streams.values())
+        counts['batching'] = self._batcher.stats() if self._batcher else None
+        return counts
@@ -0,0 +1,279 @@
+import csv
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+CSV_HEADER = ['frame_nmr', 'vehicle_id', 'vehicle_bbox', 'license_plate_bbox', 'license_plate_bbox_score',
+              'license_number', 'license_number_score']
+
+
+class DetectionLog(object):
+    """
+    Append-only, column-oriented store for the plate detections of a video.
+    Rows arrive in frame order, so a frame range maps to a contiguous slice.
+    """
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.frame_nmr = np.empty(capacity, dtype=np.int32)
+        self.vehicle_id = np.empty(capacity, dtype=np.int32)
+        self.vehicle_bbox = np.empty((capacity, 4), dtype=np.float32)
+        self.plate_bbox = np.empty((capacity, 4), dtype=np.float32)
+        self.plate_score = np.empty(capacity, dtype=np.float32)
+        self.text_score = np.empty(capacity, dtype=np.float32)
+        self.text = []
+
+    def append(self, frame_nmr, vehicle_id, vehicle_bbox, plate_bbox, plate_score, text, text_score):
+        if self.size == len(self.frame_nmr):
+            self._grow()
+        i = self.size
+        self.frame_nmr[i] = frame_nmr
+        self.vehicle_id[i] = vehicle_id
+        self.vehicle_bbox[i] = vehicle_bbox
+        self.plate_bbox[i] = plate_bbox
+        self.plate_score[i] = plate_score
+        self.text_score[i] = text_score
+        self.text.append(text)
+        self.size += 1
+
+    def _grow(self):
+        for name in ('frame_nmr', 'vehicle_id', 'vehicle_bbox', 'plate_bbox', 'plate_score', 'text_score'):
+            old = getattr(self, name)
+            new = np.empty((len(old) * 2,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def window(self, first_frame, last_frame):
+        """
+        Returns the slice of rows whose frame lies in [first_frame, last_frame].
+        """
+        frames = self.frame_nmr[:self.size]
+        start = np.searchsorted(frames, first_frame, side='left')
+        stop = np.searchsorted(frames, last_frame, side='right')
+        return slice(start, stop)
+
+    def columns(self, rows=None):
+        rows = rows if rows is not None else slice(0, self.size)
+        return (self.frame_nmr[rows], self.vehicle_id[rows], self.vehicle_bbox[rows], self.plate_bbox[rows],
+                self.plate_score[rows], self.text[rows], self.text_score[rows])
+
+
+def interpolate_detections(frames, vehicle_ids, vehicle_bboxes, plate_bboxes, plate_scores, texts, text_scores,
+                           max_gap=None):
+    """
+    Fills the frames between consecutive detections of the same vehicle with
+    linearly interpolated boxes. Interpolated rows carry a plate score of 0 and
+    the text of the detection that closes the gap. Gaps longer than max_gap
+    missing frames are left empty.
+
+    Every track is filled in the same vectorized pass: rows are grouped by
+    vehicle_id, each detection is repeated once per frame it covers and the
+    boxes are blended with its predecessor. Returns the same columns as
+    DetectionLog.columns, ordered by vehicle_id then frame.
+    """
+    frames = np.asarray(frames)
+    vehicle_ids = np.asarray(vehicle_ids)
+    order = np.lexsort((frames, vehicle_ids))
+    frames = frames[order].astype(np.int64)
+    vehicle_ids = vehicle_ids[order]
+
+    # Frames missing between each detection and the previous one of its track
+    missing = np.zeros(len(frames), dtype=np.int64)
+    if len(frames) > 1:
+        gaps = frames[1:] - frames[:-1] - 1
+        fill = (vehicle_ids[1:] == vehicle_ids[:-1]) & (gaps > 0)
+        if max_gap is not None:
+            fill &= gaps <= max_gap
+        missing[1:] = np.where(fill, gaps, 0)
+
+    counts = missing + 1
+    owner = np.repeat(np.arange(len(frames)), counts)
+    step = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    out_frames = frames[owner] - missing[owner] + step
+
+    prev = np.where(missing[owner] > 0, owner - 1, owner)
+    span = frames[owner] - frames[prev]
+    t = np.where(span > 0, (out_frames - frames[prev]) / np.maximum(span, 1), 1.0)[:, None]
+
+    vehicle_bboxes = np.asarray(vehicle_bboxes, dtype=np.float32)[order]
+    plate_bboxes = np.asarray(plate_bboxes, dtype=np.float32)[order]
+    out_vehicle = vehicle_bboxes[prev] + t * (vehicle_bboxes[owner] - vehicle_bboxes[prev])
+    out_plate = plate_bboxes[prev] + t * (plate_bboxes[owner] - plate_bboxes[prev])
+
+    exact = out_frames == frames[owner]
+    out_plate_scores = np.where(exact, np.asarray(plate_scores, dtype=np.float32)[order][owner], 0.0)
+
+    return (out_frames.astype(np.int32), vehicle_ids[owner].astype(np.int32),
+            out_vehicle.astype(np.float32), out_plate.astype(np.float32), out_plate_scores.astype(np.float32),
+            np.asarray(texts, dtype=object)[order][owner],
+            np.asarray(text_scores, dtype=np.float32)[order][owner])
+
+
+class FrameIndex(object):
+    """
+    Interpolated rows for frames [first_frame, last_frame] laid out in frame
+    order in contiguous arrays. The rows of frame f are
+    offsets[f - first_frame]:offsets[f - first_frame + 1], so a lookup is two
+    array reads and returns views, with no scanning or string parsing.
+    """
+    def __init__(self, first_frame, last_frame, frames, vehicle_bboxes, plate_bboxes, texts, text_scores):
+        keep = (frames >= first_frame) & (frames <= last_frame)
+        order = np.flatnonzero(keep)[np.argsort(frames[keep], kind='stable')]
+
+        self.first_frame = first_frame
+        self.last_frame = last_frame
+        self.vehicle_bbox = np.ascontiguousarray(vehicle_bboxes[order], dtype=np.float32)
+        self.plate_bbox = np.ascontiguousarray(plate_bboxes[order], dtype=np.float32)
+        self.text = texts[order]
+        self.text_score = np.ascontiguousarray(text_scores[order], dtype=np.float32)
+        self.offsets = np.searchsorted(frames[order], np.arange(first_frame, last_frame + 2), side='left')
+
+    def lookup(self, frame_nmr):
+        if frame_nmr < self.first_frame or frame_nmr > self.last_frame:
+            start = stop = 0
+        else:
+            start = self.offsets[frame_nmr - self.first_frame]
+            stop = self.offsets[frame_nmr - self.first_frame + 1]
+        return (self.vehicle_bbox[start:stop], self.plate_bbox[start:stop],
+                self.text[start:stop], self.text_score[start:stop])
+
+
+def interpolate_window(log, first_frame, last_frame, max_gap):
+    """
+    Interpolates only the detections that can influence frames
+    [first_frame, last_frame] and indexes the result by frame.
+    """
+    frames, _, vehicle_bboxes, plate_bboxes, _, texts, text_scores = interpolate_detections(
+        *log.columns(log.window(first_frame - max_gap, last_frame + max_gap)), max_gap=max_gap)
+    return FrameIndex(first_frame, last_frame, frames, vehicle_bboxes, plate_bboxes, texts, text_scores)
+
+
+def write_detections_csv(path, rows, brackets=False):
+    bbox_format = '[{} {} {} {}]' if brackets else '{} {} {} {}'
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for frame_nmr, vehicle_id, vehicle_bbox, plate_bbox, plate_score, text, text_score in rows:
+            writer.writerow([frame_nmr, vehicle_id, bbox_format.format(*vehicle_bbox),
+                             bbox_format.format(*plate_bbox), plate_score, text, text_score])
+
+
+class StreamingRenderer(object):
+    """
+    Holds decoded frames until every detection that can change their overlay
+    has been seen, then draws and writes them in chunks. Gaps of up to
+    `lookahead` frames are interpolated; at most lookahead + chunk frames are
+    ever buffered, regardless of the video length.
+    """
+    def __init__(self, log, draw, write, lookahead=30, chunk=None):
+        self.log = log
+        self.draw = draw
+        self.write = write
+        self.lookahead = lookahead
+        self.chunk = chunk or max(1, lookahead)
+        self.frames = deque()
+
+    def push(self, frame_nmr, frame):
+        self.frames.append((frame_nmr, frame))
+        if len(self.frames) >= self.lookahead + self.chunk:
+            self._render(self.chunk)
+
+    def close(self):
+        if self.frames:
+            self._render(len(self.frames))
+
+    def _render(self, count):
+        first_frame = self.frames[0][0]
+        last_frame = first_frame + count - 1
+        index = interpolate_window(self.log, first_frame, last_frame, self.lookahead)
+        for _ in range(count):
+            frame_nmr, frame = self.frames.popleft()
+            self.draw(frame, index.lookup(frame_nmr))
+            self.write(frame)
+
+
+class FrameSampler(object):
+    """
+    Decides which decoded frames go through the detectors. In fixed mode every
+    `stride`-th frame is sampled. In adaptive mode idle footage is sampled every
+    `stride` frames and sampling switches to every `active_stride` frames while
+    the tracker has live tracks or the scene differs from its running
+    background. Boxes on skipped frames are interpolated between the sampled
+    frames around them (the tracker only advances its Kalman state across
+    them), so `stride` should not exceed the renderer's lookahead.
+    """
+    def __init__(self, stride=1, adaptive=False, active_stride=1, motion_threshold=0.01, motion_size=(64, 36)):
+        self.stride = max(1, stride)
+        self.adaptive = adaptive
+        self.active_stride = max(1, active_stride)
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+        self.sampled = 0
+        self._last = None
+        self._background = None
+
+    def should_infer(self, frame_nmr, frame, active_tracks=False):
+        stride = self.stride
+        if self.adaptive:
+            # The background has to follow every frame, including those sampled
+            # anyway because of live tracks, or it is stale once they end
+            moving = self._motion(frame)
+            if active_tracks or moving:
+                stride = self.active_stride
+
+        sample = self._last is None or frame_nmr - self._last >= stride
+        if sample:
+            self._last = frame_nmr
+            self.sampled += 1
+        return sample
+
+    def _motion(self, frame):
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.motion_size,
+                           interpolation=cv2.INTER_AREA).astype(np.float32)
+        if self._background is None:
+            self._background = small
+            return True
+        changed = np.mean(np.abs(small - self._background) > 25)
+        cv2.accumulateWeighted(small, self._background, 0.1)
+        return changed > self.motion_threshold
+
+
+class FrameBatcher(object):
+    """
+    Collects decoded frames so the detectors can run once per batch instead of
+    once per frame. A batch is flushed when `batch_size` frames need
+    inference, when the oldest of them has waited `max_latency` seconds, or
+    when `max_frames` frames (sampled or skipped) are held. flush(entries)
+    receives (frame_nmr, frame, infer) tuples in decode order.
+    """
+    def __init__(self, flush, batch_size=8, max_latency=0.2, max_frames=None):
+        self._flush = flush
+        self.batch_size = max(1, batch_size)
+        self.max_latency = max_latency
+        self.max_frames = max_frames or self.batch_size * 4
+        self.entries = []
+        self.pending = 0
+        self._started = None
+
+    def add(self, frame_nmr, frame, infer):
+        self.entries.append((frame_nmr, frame, infer))
+        if infer:
+            self.pending += 1
+            if self.pending == 1:
+                self._started = time.monotonic()
+
+        if (self.pending == 0 or self.pending >= self.batch_size or len(self.entries) >= self.max_frames
+                or time.monotonic() - self._started >= self.max_latency):
+            self.flush()
+
+    def flush(self):
+        if not self.entries:
+            return
+        entries = self.entries
+        self.entries = []
+        self.pending = 0
+        self._flush(entries)
+
+    def close(self):
+        self.flush()